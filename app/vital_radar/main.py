@@ -1,10 +1,15 @@
 import os, sys
+import argparse
 
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QFile, QTextStream
 from PyQt6 import QtGui
 
 from vital_radar.gui.main_window import MainWindow
+from vital_radar.walabot.device import useSimulator
+from vital_radar.processing.fft_backend import BACKENDS, setFFTBackend
+from vital_radar.processing.precision import PRECISIONS, setPrecision
+from vital_radar.processing.display_modes import BEAMFORMERS, setBeamformer
 
 
 # get base directory of this script to build paths
@@ -32,13 +37,51 @@ def loadStylesheet(app: QApplication):
     file.close()   
   
     
+def parseArguments():
+    """
+    Parses the command line options of the app, the remaining arguments are passed on to Qt.
+    
+    """
+    parser = argparse.ArgumentParser(description="Vital Radar")
+    parser.add_argument("--simulate", action="store_true", 
+                        help="use a simulated Walabot instead of the device")
+    parser.add_argument("--trigger-rate", type=float, default=50.0,
+                        help="trigger rate of the simulated Walabot in Hz, 0 for as fast as possible")
+    parser.add_argument("--distance", type=float, default=1.0,
+                        help="distance of the simulated person in m")
+    parser.add_argument("--replay", metavar="SESSION_DIR",
+                        help="replay a recorded session instead of the live acquisition")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed relative to real time, 0 for as fast as possible")
+    parser.add_argument("--fft-backend", default="scipy", choices=list(BACKENDS),
+                        help="FFT implementation of the signal processing, 'fftw' requires pyfftw")
+    parser.add_argument("--fft-workers", type=int, default=1,
+                        help="threads per FFT, -1 for all cores")
+    parser.add_argument("--precision", default="double", choices=list(PRECISIONS),
+                        help="floating point precision of the processing, 'single' for float32/complex64")
+    parser.add_argument("--beamformer", default="das", choices=list(BEAMFORMERS),
+                        help="beamformer of the BREATHING mode: delay-and-sum or adaptive MVDR")
+    return parser.parse_known_args()
+    
+    
 def main():
     """
     Main function to start the GUI action loop.
     
     """
+    args, qt_args = parseArguments()
+    
+    # select the device backend before anything talks to the radar
+    if args.simulate:
+        from vital_radar.walabot.simulator import chestScene
+        useSimulator(reflectors=chestScene(args.distance), trigger_rate=args.trigger_rate or None)
+    
+    setFFTBackend(args.fft_backend, args.fft_workers)
+    setPrecision(args.precision)
+    setBeamformer(args.beamformer)
+    
     # create QApplication
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # set the custom icon 
     app.setWindowIcon(QtGui.QIcon(ICON_PATH))
@@ -49,6 +92,9 @@ def main():
     # create an instance of MainWindow()
     window = MainWindow()
     
+    if args.replay:
+        window.startReplay(args.replay, speed=args.speed or None)
+    
     # set custom window dimensions
     window.resize(1280, 800)
     
@@ -1,18 +1,19 @@
-from collections import deque
+import time
 
-from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox
+from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox, QFileDialog
 from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtGui import QFont, QFontMetrics
-import numpy as np
-
 from vital_radar.gui.widgets.image_display import ImageDisplayWidget
 from vital_radar.gui.widgets.antenna_matrix import AntennaMatrix, tx_to_rx
 from vital_radar.walabot.connection import initRadar, stopRadar, reconnectRadar
 from vital_radar.walabot.calibration import CalibrationWorker
+from vital_radar.walabot.acquisition import AcquisitionWorker
+from vital_radar.recording.recorder import Recorder, RECORDINGS_DIR
+from vital_radar.recording.replay import ReplaySource
 import vital_radar.walabot.signal_aquisition as sa
-from vital_radar.processing.display_modes import DisplayMode, computePlotData
-from vital_radar.processing.raw_signal_processing import processRawSignal, downsample_raw
-from vital_radar.processing.utils import getStack, dummy_signal_generator
+from vital_radar.processing.display_modes import DisplayMode
+from vital_radar.processing.pipeline import ProcessingPipeline
+from vital_radar.processing.utils import dummy_signal_generator
         
 
 class MainWindow(QMainWindow):
@@ -58,8 +59,7 @@ class MainWindow(QMainWindow):
         # radar and buffer
         self.radar_connected = False
         self.slow_time_N = 50
-        self.signal_buffer = deque(maxlen=10)
-        self.avg_signal_buffer = deque(maxlen=self.slow_time_N)
+        self.pipeline = ProcessingPipeline(self.current_display_mode, self.slow_time_N)
         
         self.dummy_signal_generator = dummy_signal_generator()
 
@@ -73,6 +73,16 @@ class MainWindow(QMainWindow):
 
         self.calibration_thread = None
         
+        # recorder of the current recording, None when not recording
+        self.recorder = None
+        
+        # source of the replayed recording, None when not replaying
+        self.replay_source = None
+        
+        # acquisition runs in its own thread, independent of the GUI refresh rate
+        self.acquisition_thread = None
+        self._startAcquisition()
+        
         # GUI refresh timer
         self.timer = QTimer()
         self.timer.timeout.connect(self.refreshImage)
@@ -81,42 +91,122 @@ class MainWindow(QMainWindow):
     def refreshImage(self):
         """
         This function is called repeatedtly as long as the GUI is running and updates the displayed image.
+        All frames acquired since the last call are processed, the image is drawn once with the latest state.
         """  
             
-        if not self.selected_pairs:
+        # no acquisition while calibrating, a replay doesn't need a pair selection
+        if self.acquisition_thread is None or (not self.selected_pairs and self.replay_source is None):
             return
         
-        # if no radar is connected use dummy data instead
-        if not self.radar_connected:
-            signals = next(self.dummy_signal_generator)
+        if not self.radar_connected and self.replay_source is None:
             self.freq_value.setText(f"--.-")
         else:
-            # get the signals from the walabot API
-            signals = sa.getSignals(self.selected_pairs)
-            self.freq_value.setText(f"{sa.trigger_freq:04.1f}")
-
-        # for RAW dislplay mode the signals arent processed
-        if self.current_display_mode == DisplayMode.RAW:
-            signals = downsample_raw(signals, 10)
-        else:
-            # for all other modes the IQ signals are used
-            signals = processRawSignal(signals)
-        
-        # append signals to signal buffer
-        self.signal_buffer.append(signals)
+            stats = self.acquisition_thread.rate.stats()
+            self.freq_value.setText(f"{stats['rate']:04.1f}")
+            self.freq_value.setToolTip(
+                f"Jitter: {1e3*stats['jitter']:.1f} ms\n"
+                f"Late triggers: {stats['late']}\n"
+                f"Dropped triggers: {stats['dropped']}"
+            )
 
-        avg_signal = np.mean(self.signal_buffer, axis=0)
-        self.avg_signal_buffer.append(avg_signal)
+        frames = self.acquisition_thread.popFrames()
+        if not frames:
+            return
         
-        # convert buffer to matrix
-        signal_matrix = getStack(self.avg_signal_buffer)
-
+        for frame in frames:
+            self.pipeline.push(frame)
+            
         # compute plot data
-        plot_data = computePlotData(signal_matrix, self.current_display_mode, self.selected_pairs)
+        plot_data = self.pipeline.plotData()
+        if plot_data is None:
+            return
 
         # update plot
         self.image_widget.updateImage(plot_data, self.current_display_mode)
         
+    def _startAcquisition(self):
+        """
+        Starts the acquisition thread, reading from the replayed recording, the radar or from the dummy generator 
+        if no radar is connected. A running acquisition thread is stopped first. While the radar is calibrating the 
+        live acquisition is started when the calibration is finished.
+        
+        """
+        # only one thread triggers the radar
+        self._stopAcquisition()
+        if self.replay_source is None and self._calibrating():
+            return
+        
+        if self.replay_source is not None:
+            source = self.replay_source
+            period = 0.0
+        elif self.radar_connected:
+            # new reader per connection, the antenna pair objects are resolved once
+            source = sa.SignalReader().acquire
+            period = 0.0
+        else:
+            source = lambda pairs, out: (time.perf_counter(), next(self.dummy_signal_generator))
+            period = 0.1
+            
+        self.acquisition_thread = AcquisitionWorker(source, period=period)
+        self.acquisition_thread.setPairs(self.selected_pairs)
+        self.acquisition_thread.setRecorder(self.recorder)
+        self.acquisition_thread.start()
+        
+    def _stopAcquisition(self):
+        """
+        Stops the acquisition thread, so that no other thread triggers the radar.
+        
+        """
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.stop()
+            self.acquisition_thread = None
+        
+    def toggleRecording(self, checked: bool):
+        """
+        Slot connected to record button. Records the raw frames of the acquisition to disk.
+        
+        """
+        if checked:
+            self.recorder = Recorder()
+            print(f"Recording to {self.recorder.session_dir}")
+            if self.acquisition_thread is not None:
+                self.acquisition_thread.setRecorder(self.recorder)
+        else:
+            if self.acquisition_thread is not None:
+                self.acquisition_thread.setRecorder(None)
+            self.recorder.close()
+            print(f"Recorded {self.recorder.frames} frames, dropped {self.recorder.dropped}")
+            self.recorder = None
+        
+    def toggleReplay(self, checked: bool):
+        """
+        Slot connected to replay button. Replays a recording in real time instead of the live acquisition.
+        
+        """
+        if checked:
+            session_dir = QFileDialog.getExistingDirectory(self, "Select recording", RECORDINGS_DIR)
+            if not session_dir:
+                self.replay_button.setChecked(False)
+                return
+            self.startReplay(session_dir)
+        else:
+            self.startReplay(None)
+            
+    def startReplay(self, session_dir, speed=1.0):
+        """
+        Replaces the live acquisition by the replay of a recording, None returns to the live acquisition.
+        'speed' is the replay speed relative to real time, None replays as fast as possible.
+        
+        """
+        self._stopAcquisition()
+        self.replay_source = None if session_dir is None else ReplaySource(session_dir, speed=speed, loop=True)
+        self.pipeline.reset()
+        self._startAcquisition()
+        
+        self.replay_button.blockSignals(True)
+        self.replay_button.setChecked(session_dir is not None)
+        self.replay_button.blockSignals(False)
+        
     def calibrateRadar(self):
         """
         Slot connected to calibration button.
@@ -127,23 +217,59 @@ class MainWindow(QMainWindow):
             return
 
         if self.calibration_thread is None or not self.calibration_thread.isRunning():
+            # calibration triggers the radar itself, pause the acquisition until it is finished
+            self._stopAcquisition()
             self.calibration_thread = CalibrationWorker()
+            self.calibration_thread.finished.connect(self._calibrationFinished)
             self.calibration_thread.start()
             
-        self.signal_buffer.clear()
-        self.avg_signal_buffer.clear()
+        self.pipeline.reset()
+
+    def _calibrating(self):
+        return self.calibration_thread is not None and self.calibration_thread.isRunning()
+
+    def _calibrationFinished(self):
+        """
+        Resumes the acquisition after the calibration, unless a replay has taken over in the meantime.
+        
+        """
+        # finished is delivered after the thread ended, a newer calibration may have started since
+        if self.sender() is not self.calibration_thread:
+            return
+        self.calibration_thread.wait()
+        if self.acquisition_thread is None:
+            self._startAcquisition()
+
+    def _stopCalibration(self):
+        """
+        Ends a running calibration and waits for it, without resuming the acquisition when it is finished.
+        
+        """
+        if self.calibration_thread is None:
+            return
+        try:
+            self.calibration_thread.finished.disconnect(self._calibrationFinished)
+        except TypeError:
+            # not connected anymore
+            pass
+        self.calibration_thread.requestInterruption()
+        self.calibration_thread.wait()
+        self.calibration_thread = None
 
     def reconnectRadar(self):
         """
         Slot connected to reconnect button.
         
         """
+        self._stopCalibration()
+        self._stopAcquisition()
         try:
             success = reconnectRadar()
             self.updateStatus(success)
         except Exception as e:
             print("Reconnect failed:", e)
             self.updateStatus(False)
+        self._startAcquisition()
         
     def updateStatus(self, connected: bool):
         self.radar_connected = connected
@@ -162,6 +288,10 @@ class MainWindow(QMainWindow):
         
         """
         self.timer.stop()
+        self._stopCalibration()
+        self._stopAcquisition()
+        if self.recorder is not None:
+            self.recorder.close()
         stopRadar()
         event.accept()
     
@@ -171,8 +301,7 @@ class MainWindow(QMainWindow):
         
         """
         self.current_display_mode = self.mode_combo.currentData()
-        self.signal_buffer.clear()
-        self.avg_signal_buffer.clear()
+        self.pipeline.setDisplayMode(self.current_display_mode)
         self.image_widget.clear(self.current_display_mode)
         
     def onMatrixChange(self, tx: int, rx: int, checked: bool):
@@ -185,8 +314,9 @@ class MainWindow(QMainWindow):
         else:
             self.selected_pairs.discard((tx, rx))
             
-        self.signal_buffer.clear()
-        self.avg_signal_buffer.clear()
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.setPairs(self.selected_pairs)
+        self.pipeline.reset()
         self.image_widget.clear(self.current_display_mode)
     
     def _buildPlotArea(self):
@@ -209,6 +339,16 @@ class MainWindow(QMainWindow):
         # buttons (left)
         hbox.addWidget(self._buildButton("Calibrate", self.calibrateRadar))
         hbox.addWidget(self._buildButton("Reconnect", self.reconnectRadar))
+        
+        record_button = QPushButton("Record")
+        record_button.setCheckable(True)
+        record_button.toggled.connect(self.toggleRecording)
+        hbox.addWidget(record_button)
+        
+        self.replay_button = QPushButton("Replay")
+        self.replay_button.setCheckable(True)
+        self.replay_button.toggled.connect(self.toggleReplay)
+        hbox.addWidget(self.replay_button)
 
         # add gap 
         hbox.addStretch()
@@ -1,16 +1,12 @@
-from collections import deque
-
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QSizePolicy
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import signal
 
 from vital_radar.processing.distance_estimation import sample2range
 from vital_radar.processing.display_modes import DisplayMode
-from vital_radar.processing.utils import moving_average
-from vital_radar.processing.spectrum_estimation import getWelch, getARpsd, bandpassFilter
-import vital_radar.walabot.signal_aquisition as sa
+from vital_radar.processing.detection import DETECTION_DTYPE
+from vital_radar.processing.spectrum_estimation import getARpsd, bandpassFilter
 
 
 class ImageDisplayWidget(QWidget):
@@ -39,8 +35,7 @@ class ImageDisplayWidget(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.addWidget(self.canvas)
         self.setLayout(layout)
-        
-        self.buffer = deque(maxlen=50)
+
 
     def updateImage(self, data, display_mode):
         # clear the figure to prepare for new plots
@@ -71,6 +66,16 @@ class ImageDisplayWidget(QWidget):
                 ax_time = self.figure.add_subplot(1, 2, 1)
                 ax_psd = self.figure.add_subplot(1, 2, 2)
                 self._plotBreathing(ax_time, ax_psd, data)
+            case DisplayMode.IMAGE:
+                # single image
+                ax = self.figure.add_subplot(1, 1, 1)
+                self._plotImage(ax, data)
+                self.ax = ax
+            case DisplayMode.VITALS:
+                # displacements and band spectra side by side
+                ax_time = self.figure.add_subplot(1, 2, 1)
+                ax_psd = self.figure.add_subplot(1, 2, 2)
+                self._plotVitals(ax_time, ax_psd, data)
 
         self.canvas.draw()
 
@@ -130,15 +135,16 @@ class ImageDisplayWidget(QWidget):
         ax.legend(loc='upper right')
 
     def _plotDistance(self, ax, data):
+        # data is (slow-time variance, detected targets), the default data has no targets
+        if isinstance(data, tuple):
+            data, targets = data
+        else:
+            targets = np.empty(0, dtype=DETECTION_DTYPE)
+        
         # x-axis array
         N = data.shape[0]
         x = sample2range(np.arange(N))
         
-        # find peak index
-        peak_idx = np.argmax(data)
-        # convert to range
-        peak_range = x[peak_idx]
-        
         # plot
         ax.plot(x, np.abs(data)**2)
         
@@ -146,57 +152,105 @@ class ImageDisplayWidget(QWidget):
         ax.set_xlabel('Range (m)')
         # round up max value
         end = int(np.ceil(x.max()))
-        # ticks
-        ticks = [0, peak_range, end]
-        ax.set_xticks(ticks)
+        # ticks at the targets
+        ranges = np.sort(targets['range'])
+        ax.set_xticks([0, *ranges, end])
         # custom labels for round numbers
-        labels = ['0', f'{peak_range:.2f}', str(end)]
-        ax.set_xticklabels(labels)
+        ax.set_xticklabels(['0', *[f'{r:.2f}' for r in ranges], str(end)])
         # limits
         ax.set_xlim(0, end)
         
         # y-axis customization
         ax.set_ylabel('Normalized slow time variance')
         
-        # red line to highlight maximum
-        ax.axvline(peak_range, color='red', linestyle='--', label='Peak distance')
-        for tick_val, tick_label in zip(ax.get_xticks(), ax.get_xticklabels()):
-            if np.isclose(tick_val, peak_range):
-                tick_label.set_color('red')
+        # red lines to highlight the targets, the strongest dashed
+        for i, target in enumerate(targets):
+            ax.axvline(target['range'], color='red', linestyle='--' if i == 0 else ':', 
+                       label='Detected targets' if i == 0 else None)
+        for tick_label in ax.get_xticklabels()[1:-1]:
+            tick_label.set_color('red')
             
         # legend
-        ax.legend()
+        if len(targets):
+            ax.legend()
 
-    def _plotBreathing(self, ax_time, ax_psd, data):
-        fs = sa.trigger_freq
+    def _plotImage(self, ax, data):
+        # data is (image, x, y, distance), nothing to plot for the default data
+        if not isinstance(data, tuple):
+            return
+        image, x, y, d = data
         
-        # handle cases when trigger_freq is NaN
-        if not np.isfinite(fs):
-            fs = 1
-            
-        if len(data) < 10:
+        # normalized magnitude
+        peak = image.max()
+        if peak > 0:
+            image = image / peak
+        
+        # plot
+        ax.imshow(image, extent=(x[0], x[-1], y[0], y[-1]), origin='lower', aspect='equal', vmin=0, vmax=1, 
+                  cmap='viridis')
+        
+        ax.set_title(f'Cross-range image at {d:.2f} m')
+        
+        # axes
+        ax.set_xlabel('x (m)')
+        ax.set_ylabel('y (m)')
+        
+        # mark the maximum
+        iy, ix = np.unravel_index(np.argmax(image), image.shape)
+        ax.plot(x[ix], y[iy], 'r+', markersize=12)
+
+    def _plotVitals(self, ax_time, ax_psd, data):
+        # data is (timestamps, breathing and heart displacement, estimate, band spectra), nothing to plot for the 
+        # default data
+        if not isinstance(data, tuple):
             return
+        t, breathing, heart, estimate, spectra = data
         
-        x = moving_average(data, 30)
+        if len(t) < 2:
+            return
+        
+        # filtered displacements in mm, time relative to the latest sample
+        ax_time.plot(t - t[-1], 1e3 * breathing, label='Breathing')
+        ax_time.plot(t - t[-1], 1e3 * heart, label='Heart')
         
-        fc = 0.1
-        b, a = signal.butter(2, fc/(fs/2), btype='high')
-        x = signal.filtfilt(b, a, x)
+        ax_time.set_title('Displacement')
+        ax_time.set_xlabel('Time (s)')
+        ax_time.set_ylabel('Displacement (mm)')
+        ax_time.legend(loc='upper right')
         
-        fc = 0.6
-        b, a = signal.butter(2, fc/(fs/2), btype='low')
-        x = signal.filtfilt(b, a, x)
+        # band spectra over the rate, normalized by their peak
+        for name, (f, P) in spectra.items():
+            peak = P.max()
+            ax_psd.plot(60 * f, P / peak if peak > 0 else P, label=name)
         
-        self.buffer.append(x[-1])
-        buffer = np.array(self.buffer)
+        ax_psd.set_xlabel('Rate (1/min)')
+        ax_psd.set_ylabel('Normalized PSD')
+        ax_psd.set_ylim(0, 1.1)
         
-        # FFT & PSD
-        f, P = getWelch(x, fs)
+        if estimate is None:
+            ax_psd.set_title('Estimating...')
+            return
+        
+        # estimated rates and their confidence in percent
+        ax_psd.set_title(f'Breathing {estimate.breathing_rate:.1f}/min ({estimate.breathing_confidence:.0%})\n'
+                         f'Heart {estimate.heart_rate:.1f}/min ({estimate.heart_confidence:.0%})')
+        ax_psd.axvline(estimate.breathing_rate, color='red', linestyle='--', label='Estimated rates')
+        ax_psd.axvline(estimate.heart_rate, color='red', linestyle='--')
+        
+        ax_psd.legend(loc='upper right')
 
-        k = np.arange(-len(buffer), 0, 1)
+    def _plotBreathing(self, ax_time, ax_psd, data):
+        # data is (timestamps, filtered breathing signal, frequencies, PSD, band spectra), nothing to plot for the 
+        # default data
+        if not isinstance(data, tuple):
+            return
+        t, x, f, P, spectra = data
+            
+        if x is None or len(x) < 10 or f is None:
+            return
 
-        # Plot time-domain signal
-        ax_time.plot(k/np.ceil(fs), buffer)
+        # Plot time-domain signal, time relative to the latest sample
+        ax_time.plot(t - t[-1], x)
         
         ax_time.set_title('Time Signal')
         
@@ -207,7 +261,11 @@ class ImageDisplayWidget(QWidget):
         ax_time.set_ylim(-0.003, 0.003)
 
         # Plot frequency-domain PSD (normalized)
-        ax_psd.plot(f, P)
+        ax_psd.plot(f, P, label='Welch')
+        
+        # spectra on the breathing band
+        for name, (f_band, P_band) in spectra.items():
+            ax_psd.plot(f_band, P_band, linestyle='--', label=name)
         
         ax_psd.set_title('Spectrum Estimate')
         
@@ -0,0 +1,181 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import ZoomFFT, get_window
+
+from vital_radar.processing.spectrum_estimation import bandGrid
+from vital_radar.processing.tracking import peakInterpolation
+from vital_radar.processing.utils import RingBuffer
+
+
+def peakFrequency(f, P):
+    """
+    Frequency (Hz) of the maximum of the spectrum P on the uniform grid f, interpolated between the grid points.
+
+    """
+    k = int(np.argmax(P))
+    return f[0] + peakInterpolation(P, k) * (f[1] - f[0])
+
+
+def peakConfidence(f, P, width):
+    """
+    Share of the power of the spectrum P on the grid f within -+ width (Hz) of its maximum, scaled so that a flat
+    (white noise) spectrum gives 0 and a spectrum with all power around the peak gives 1.
+
+    """
+    near = np.abs(f - f[np.argmax(P)]) <= width
+    baseline = near.mean()
+    total = P.sum()
+    if baseline >= 1 or total <= 0:
+        return 0.0
+    share = P[near].sum() / total
+    return float(np.clip((share - baseline) / (1 - baseline), 0, 1))
+
+
+class SlidingDFTBank:
+    """
+    Hann windowed spectrum of the last 'window' samples of a stream, only at the frequencies of a grid (Hz), e.g.
+    bandGrid(BREATHING_BAND). The grid can be much finer than fs / nfft of an FFT of the same window.
+
+    Every grid frequency w is a sliding DFT over the rectangular window,
+
+        X' = (X - x_old) exp(j w) + x_new exp(-j w (window - 1)),
+
+    so a new sample costs O(grid) instead of a transform of the window. The Hann window is applied in the frequency
+    domain from the neighbouring bins w -+ 2 pi / window, which are part of the bank: Xh = X / 2 - (X- + X+) / 4.
+    The bins are recomputed from the window every 'recompute_every' samples, so rounding errors of the rotations
+    don't accumulate, and when the sampling rate drifts by more than 'tolerance' (relative).
+
+    """
+    def __init__(self, freqs, window, recompute_every=10000, tolerance=0.01):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.window = window
+        self.recompute_every = recompute_every
+        self.tolerance = tolerance
+        self.samples = RingBuffer(window)
+
+        # power of the Hann window for the density scaling
+        self._window_power = np.sum(get_window('hann', window) ** 2)
+        self.fs = None
+        self.clear()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def clear(self):
+        self.samples.clear()
+        self._X = None
+        self._updates = 0
+
+    def _design(self, fs):
+        """
+        Angular frequencies (rad/sample) of the grid and its neighbours at fs, returns whether they changed.
+
+        """
+        if self.fs is not None and abs(fs - self.fs) <= self.tolerance * self.fs:
+            return False
+        self.fs = fs
+        f = self.freqs / fs
+        omega = 2 * np.pi * np.concatenate((f - 1 / self.window, f, f + 1 / self.window))
+        self._rotation = np.exp(1j * omega)
+        self._step = np.exp(-1j * omega)
+        self._newest = np.exp(-1j * omega * (self.window - 1))
+        self._omega = omega
+        return True
+
+    def _recompute(self):
+        """
+        DFT of the samples in the window, with the oldest sample at phase 0.
+
+        """
+        # Horner's scheme in z = exp(-j w): X = x_0 + z (x_1 + z (x_2 + ...)), without a table of exponentials
+        X = np.zeros(len(self._omega), dtype=complex)
+        for sample in self.samples.view()[::-1].tolist():
+            X *= self._step
+            X += sample
+        self._X = X
+        self._phase = self._step ** len(self.samples)
+
+    def update(self, x, fs):
+        """
+        Adds new samples x (a scalar or 1D array) of the stream sampled at fs (Hz).
+
+        """
+        if self._design(fs) and self._X is not None:
+            self._recompute()
+
+        for sample in np.atleast_1d(np.asarray(x, dtype=float)):
+            if self._X is None:
+                self._X = np.zeros(len(self._omega), dtype=complex)
+                self._phase = np.ones(len(self._omega), dtype=complex)
+
+            if self.samples.full:
+                # slide: remove the oldest sample, shift the phase reference and add the new sample at the end
+                X = self._X
+                X -= self.samples.view()[0]
+                X *= self._rotation
+                X += sample * self._newest
+                self.samples.append(sample)
+            else:
+                # window still filling up, the new sample gets the phase of its position
+                self._X += sample * self._phase
+                self._phase *= self._step
+                self.samples.append(sample)
+
+            self._updates += 1
+            if self._updates % self.recompute_every == 0:
+                self._recompute()
+
+    def spectrum(self):
+        """
+        Hann windowed DFT of the window at the grid frequencies, None until the window is full.
+
+        """
+        if not self.samples.full:
+            return None
+        F = len(self.freqs)
+        lower, center, upper = self._X[:F], self._X[F:2 * F], self._X[2 * F:]
+        return 0.5 * center - 0.25 * (lower + upper)
+
+    def psd(self):
+        """
+        One-sided PSD (density, like welch()) of the window at the grid frequencies, None until the window is full.
+
+        """
+        X = self.spectrum()
+        if X is None:
+            return None
+        return 2 * (X.real ** 2 + X.imag ** 2) / (self.fs * self._window_power)
+
+    def peak(self):
+        """
+        Interpolated frequency (Hz) of the maximum of the PSD, None until the window is full.
+
+        """
+        P = self.psd()
+        return None if P is None else peakFrequency(self.freqs, P)
+
+
+def zoomWelch(x, fs, band, resolution=0.005, nperseg=None, noverlap=None):
+    """
+    Welch PSD of x (Hann window, constant detrend, density scaling like welch()) evaluated only on the grid of
+    'band' (Hz) with the given resolution (Hz), with a zoom FFT (chirp z-transform) per segment. This is cheaper
+    than a zero padded FFT on a grid of the same spacing, which can be much finer than fs / nperseg.
+    'nperseg' defaults to the whole signal, 'noverlap' to half a segment.
+
+    Returns:
+        f: frequencies of the band grid in Hz
+        P: PSD
+    """
+    x = np.asarray(x, dtype=float)
+    nperseg = len(x) if nperseg is None else min(int(nperseg), len(x))
+    noverlap = nperseg // 2 if noverlap is None else noverlap
+
+    f = bandGrid(band, resolution)
+    window = get_window('hann', nperseg)
+    segments = sliding_window_view(x, nperseg)[::nperseg - noverlap]
+    segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+
+    transform = ZoomFFT(nperseg, [f[0], f[-1]], m=len(f), fs=fs, endpoint=True)
+    X = transform(segments, axis=-1)
+    P = 2 * np.mean(X.real ** 2 + X.imag ** 2, axis=0) / (fs * np.sum(window ** 2))
+    return f, P
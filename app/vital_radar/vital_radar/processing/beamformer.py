@@ -1,52 +1,324 @@
+from collections import OrderedDict
+
 import numpy as np
     
     
 from scipy.constants import c
 
+from vital_radar.processing.distance_estimation import sample2range
+from vital_radar.processing.utils import RingBuffer
+
 
 class DelaySumBeamformer:
     """
     A simple delay-and-sum beamformer assuming signal_matrix is (slow-time, fast-time, channels).
 
     """
-    def __init__(self, element_positions, frequencies):
-        self.positions = np.asarray(element_positions)  
+    def __init__(self, element_positions, frequencies, pairs=None, cache_size=16, resolution=1e-3,
+                 range_resolution=sample2range(1)):
         self.freqs = np.asarray(frequencies)           
         
         # Precompute angular frequencies
         self.omega = 2 * np.pi * self.freqs           
+        
+        # LRU cache of steering weights, keyed by the pairs and the target points on the grid of quantize()
+        self.cache_size = cache_size
+        self.resolution = resolution
+        self.range_resolution = range_resolution
+        self.grid = np.array([resolution, resolution, range_resolution])
+        self._weights = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+        # counts the changes of the weights by the data, the delay-and-sum weights only depend on the geometry
+        self.version = 0
+        
+        self.setElements(element_positions, pairs)
 
-    def _compute_delays(self, target_point):
+    def setElements(self, element_positions, pairs=None):
         """
-        Compute one-way delays from each element to the target and back
+        Sets the element positions of a new antenna selection, which invalidates the cached weights
         
         """
-        # distances: shape (L,)
-        d = np.linalg.norm(self.positions - target_point[None, :], axis=1)
+        self.positions = np.asarray(element_positions)
+        self.pairs = None if pairs is None else tuple(pairs)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Empties the weight cache
+        
+        """
+        self._weights.clear()
+
+    def _compute_delays(self, target_points):
+        """
+        Compute one-way delays from each element to the targets and back
+        
+        """
+        # distances: shape (L,) for one point (3,), (P, L) for points (P, 3)
+        d = np.linalg.norm(self.positions - target_points[..., None, :], axis=-1)
         return 2 * d / c  
 
     def _compute_weights(self, delays):
         """
-        Steering weights per element and frequency
+        Steering weights per element and frequency, shape (L, F) or (P, L, F)
+
+        """
+        return np.exp(-1j * delays[..., None] * self.omega)
+
+    def steering(self, target_points, dtype=np.complex128):
+        """
+        Steering tensor of the target points (P, 3), shape (P, L, F)
+
+        """
+        delays = self._compute_delays(np.atleast_2d(np.asarray(target_points, dtype=float)))
+        return self._compute_weights(delays).astype(dtype, copy=False)
+
+    def quantize(self, target_points):
+        """
+        Grid indices of the target points: x and y in steps of 'resolution', z in steps of 'range_resolution' (m), 
+        by default the range-bin grid. The weights are steered to the grid points, so points with the same indices 
+        share their weights.
+
+        """
+        return np.round(np.asarray(target_points, dtype=float) / self.grid).astype(np.int64)
+
+    def _cached_weights(self, points, dtype, sum_beams):
+        """
+        Weights ready to apply, (F, L) for summed beams or (P, L, F), of the quantized points, from the cache if 
+        they were used before
+
+        """
+        index = self.quantize(points)
+        key = (self.pairs, index.tobytes(), index.shape, sum_beams, np.dtype(dtype).str)
+        w = self._weights.get(key)
+        if w is not None:
+            self._weights.move_to_end(key)
+            self.hits += 1
+            return w
+        
+        self.misses += 1
+        w = self.steering(index * self.grid, dtype)
+        if sum_beams:
+            w = np.ascontiguousarray(w.sum(axis=0).T)
+        
+        if self.cache_size > 0:
+            self._weights[key] = w
+            if len(self._weights) > self.cache_size:
+                self._weights.popitem(last=False)
+        return w
+
+    def weights(self, points, dtype, sum_beams, bins=slice(None)):
+        """
+        Weights applied by beamform(), (F, L) for summed beams or (P, L, F), of the fast-time 'bins'
+
+        """
+        w = self._cached_weights(points, dtype, sum_beams)
+        return w[bins] if sum_beams else w[..., bins]
+
+    def update(self, signals):
+        """
+        Adds a new frame (fast-time x channels), the delay-and-sum weights don't depend on the data
+
+        """
+        pass
+
+    def beamform(self, signal_matrix, target_points, sum_beams=False, bins=None):
+        """
+        Apply delay-and-sum beamformer to a signal matrix.
+        The weights are computed in double precision and applied in the precision of the signal matrix. They are 
+        cached, so beamforming to the same points again only costs the multiply and sum.
+        
+        For a single point (3,) the beam has shape (slow-time, fast-time). For points (P, 3) all beams are computed
+        with one contraction over the channels, shape (P, slow-time, fast-time). With 'sum_beams' the sum of the beams 
+        is returned, which equals a single beam with the summed weights and costs the same.
+        'bins' (a slice) restricts the beams to these fast-time bins, e.g. the range gate of the target.
+
+        """
+        points = np.asarray(target_points, dtype=float)
+        dtype = np.result_type(signal_matrix.dtype, np.complex64)
+        bins = slice(None) if bins is None else bins
+        signal_matrix = signal_matrix[:, bins]
+        
+        if points.ndim == 1 or sum_beams:
+            # summed weights, transposed to (F, L)
+            w_fl = self.weights(points, dtype, True, bins)
+                                           
+            # Multiply weights and sum across channels
+            weighted = signal_matrix * w_fl[None, :, :]      
+            
+            # Sum over channel axis
+            return np.sum(weighted, axis=2)
+        
+        # all beams: sum over channels of signal (S, F, L) times weights (P, L, F)
+        w = self.weights(points, dtype, False, bins)
+        return np.einsum('sfl,plf->psf', signal_matrix, w, optimize=True)
+
+
+class MVDRBeamformer(DelaySumBeamformer):
+    """
+    Adaptive minimum variance distortionless response (Capon) beamformer with the interface of the 
+    DelaySumBeamformer, assuming signal_matrix is (slow-time, fast-time, channels).
 
+    Per fast-time bin f it keeps the inverse P of the exponentially weighted channel covariance 
+    R' = forgetting * R + x x^H, updated with every frame x by the Sherman-Morrison formula instead of an inversion:
+
+        P' = (P - P x x^H P / (forgetting + x^H P x)) / forgetting
+
+    The weights h = P a / (a^H P a) pass the target with steering vector a undistorted and minimize the power of
+    everything else. They are scaled by the number of channels, so the target gain equals that of the delay-and-sum 
+    beam and both can be swapped. P starts as the identity over 'loading' times the mean power of the first frame. 
+    The diagonal loading is kept up with a second rank-1 update per frame on one channel, 'loading' times the power of
+    the bin, otherwise it would fade with the forgetting. Without it the strong and steady chest return makes P so 
+    sharp that the small mismatch of the steering vectors (virtual element positions) nulls the target itself.
+    Until the first update the weights equal the delay-and-sum weights.
+    
+    The weights are held fixed between refreshes: they use a copy of P taken at the first update and every 
+    'refresh_every' updates after it, and each refresh increments 'version'. So beams of different frames are formed
+    with the same weights until the next refresh, and a StreamingBeamformer only has to beamform its window again
+    when the version changes.
+
+    """
+    def __init__(self, element_positions, frequencies, pairs=None, forgetting=0.98, loading=0.1, 
+                 symmetrize_every=100, refresh_every=50, **kwargs):
+        self.forgetting = forgetting
+        self.loading = loading
+        self.symmetrize_every = symmetrize_every
+        self.refresh_every = refresh_every
+        super().__init__(element_positions, frequencies, pairs, **kwargs)
+
+    def setElements(self, element_positions, pairs=None):
+        """
+        Sets the element positions of a new antenna selection, which resets the covariance
+        
         """
-        return np.exp(-1j * np.outer(delays, self.omega)) 
+        super().setElements(element_positions, pairs)
+        self.P = None
+        self.P_weights = None
+        self.updates = 0
 
-    def beamform(self, signal_matrix, target_point):
+    def update(self, signals):
         """
-        Apply delay-and-sum beamformer to a signal matrix
+        Adds a new frame (fast-time x channels) to the inverse covariance of every fast-time bin
 
         """
-        # Compute delays and weights
-        delays = self._compute_delays(target_point)      
-        w = self._compute_weights(delays)    
-                     
-        # Transpose
-        w_fl = w.T     
-                                       
-        # Multiply weights and sum across channels
-        weighted = signal_matrix * w_fl[None, :, :]      
+        x = np.asarray(signals, dtype=np.complex128)
+        if self.P is None or self.P.shape[1] != x.shape[1]:
+            F, L = x.shape
+            delta = self.loading * np.mean(np.abs(x) ** 2)
+            self.P = np.tile(np.eye(L, dtype=np.complex128) / max(delta, np.finfo(float).tiny), (F, 1, 1))
+            self.P_weights = None
+            self.updates = 0
+        
+        # rank-1 update of all bins at once, P is hermitian so x^H P = (P x)^H
+        Px = np.einsum('fij,fj->fi', self.P, x)
+        denom = self.forgetting + np.real(np.einsum('fi,fi->f', x.conj(), Px))
+        self.P -= Px[:, :, None] * Px.conj()[:, None, :] / denom[:, None, None]
+        self.P /= self.forgetting
+        
+        # diagonal loading u u^H with u = sqrt(delta) e_k on one channel k per frame, so it doesn't fade with the
+        # forgetting: every channel is loaded once per L frames with L times the loading of a frame
+        L = x.shape[1]
+        k = self.updates % L
+        delta = self.loading * L * np.mean(np.abs(x) ** 2, axis=1)
+        Pu = self.P[:, :, k] * np.sqrt(delta)[:, None]
+        self.P -= Pu[:, :, None] * Pu.conj()[:, None, :] / (1 + delta * np.real(self.P[:, k, k]))[:, None, None]
         
-        # Sum over channel axis
-        return np.sum(weighted, axis=2)                 
-  
\ No newline at end of file
+        # remove the rounding errors that make P non-hermitian
+        self.updates += 1
+        if self.updates % self.symmetrize_every == 0:
+            self.P = 0.5 * (self.P + self.P.conj().transpose(0, 2, 1))
+        
+        # new weights only at a refresh
+        if self.P_weights is None or self.updates % self.refresh_every == 0:
+            self.P_weights = self.P.copy()
+            self.version += 1
+
+    def weights(self, points, dtype, sum_beams, bins=slice(None)):
+        """
+        MVDR weights in the convention of the delay-and-sum weights, (F, L) for summed beams or (P, L, F), of the
+        fast-time 'bins'
+
+        """
+        if self.P_weights is None:
+            return super().weights(points, dtype, sum_beams, bins)
+        
+        # steering vectors a = conj(delay-and-sum weights), as (F, L, P) for a batched product per bin
+        a = self._cached_weights(points, np.complex128, sum_beams=False).conj().transpose(2, 1, 0)[bins]
+        L = a.shape[1]
+        
+        Pa = self.P_weights[bins] @ a
+        gain = np.real(np.sum(a.conj() * Pa, axis=1))
+        h = L * Pa / gain[:, None, :]
+        
+        # beam = h^H x
+        w = h.conj()
+        if sum_beams:
+            return w.sum(axis=2).astype(dtype)
+        return w.transpose(2, 1, 0).astype(dtype)
+
+
+class StreamingBeamformer:
+    """
+    Beamforms every frame once when it arrives and keeps the beam (fast-time) and its magnitude collapsed over 
+    fast-time in its own slow-time rings, aligned with the window of the signal buffer.
+    Only when the targets move, the weights of an adaptive beamformer are refreshed (see 'version') or the window is 
+    out of step, the whole window is beamformed again with the new weights, so in steady state a frame costs one (fast-time x channels) multiply and sum instead of the window.
+
+    """
+    def __init__(self, window):
+        self.beams = RingBuffer(window)
+        self.magnitude = RingBuffer(window)
+        self.recomputes = 0
+        self._key = None
+
+    def clear(self):
+        self.beams.clear()
+        self.magnitude.clear()
+        self._key = None
+
+    def push(self, beamformer, signals, target_points, window, bins=None):
+        """
+        Adds the summed beam of the newest frame 'signals' (fast-time x channels) to the targets. 'window' is the 
+        RingBuffer of the frames, with 'signals' already appended. 'bins' restricts the beams to a range gate.
+
+        """
+        points = np.asarray(target_points, dtype=float)
+        key = (id(beamformer), beamformer.version, beamformer.pairs, beamformer.quantize(points).tobytes(),
+               None if bins is None else (bins.start, bins.stop))
+        
+        if key == self._key and min(len(self.beams) + 1, self.beams.capacity) == len(window):
+            beam = beamformer.beamform(signals[None], points, sum_beams=True, bins=bins)[0]
+            self.beams.append(beam)
+            self.magnitude.append(np.abs(beam).sum())
+            return
+        
+        # targets moved: beamform the whole window with the new weights
+        B = beamformer.beamform(window.view(), points, sum_beams=True, bins=bins)
+        self.clear()
+        for beam, magnitude in zip(B, np.abs(B).sum(axis=1)):
+            self.beams.append(beam)
+            self.magnitude.append(magnitude)
+        self._key = key
+        self.recomputes += 1
+
+
+def generateGrid(distance, radius, N):
+    """
+    N x N grid of target points in the plane at 'distance' (z), from -radius to radius in x and y.
+    
+    Returns:
+        points: numpy array (N*N, 3)
+    """
+    # 1D coordinates
+    xs = np.linspace(-radius, radius, N)
+    ys = np.linspace(-radius, radius, N)
+    # 2D mesh
+    xv, yv = np.meshgrid(xs, ys, indexing='xy')
+    # flatten and stack
+    x_flat = xv.ravel()
+    y_flat = yv.ravel()
+    z_flat = np.full_like(x_flat, distance)
+    points = np.vstack((x_flat, y_flat, z_flat)).T
+    return points
@@ -0,0 +1,426 @@
+import os
+import timeit
+import argparse
+
+import numpy as np
+
+from vital_radar.processing.raw_signal_processing import (BASEBAND_ENGINES, FC, FS, processRawSignal, downconvert,
+                                                          downsample)
+from vital_radar.processing.fft_backend import availableBackends, getFFTBackend, setFFTBackend
+from vital_radar.processing.precision import PRECISIONS, getPrecision, setPrecision
+from vital_radar.processing.display_modes import DisplayMode, computePlotData, F_START, F_STOP, K
+from vital_radar.processing.beamformer import DelaySumBeamformer, MVDRBeamformer, generateGrid
+from vital_radar.processing.imaging import BackprojectionImager, IMAGE_X, IMAGE_Y
+from vital_radar.walabot.antenna_layout import antenna_layout
+from vital_radar.processing.distance_estimation import distance, slowVar, sample2range
+from vital_radar.processing.detection import CFAR_METHODS, CFARDetector
+from vital_radar.processing.spectrum_estimation import SlidingWelch, getWelch, bandGrid, BREATHING_BAND, HEART_BAND
+from vital_radar.processing.band_spectrum import SlidingDFTBank, peakFrequency, zoomWelch
+from vital_radar.processing.vital_signs import VitalSignEstimator, WAVELENGTH
+from vital_radar.processing.pipeline import ProcessingPipeline
+from vital_radar.walabot.acquisition import Frame
+from vital_radar.walabot.simulator import SimulatedWalabot, Reflector, chestScene
+from vital_radar.gui.widgets.antenna_matrix import tx_to_rx
+
+
+# all antenna pairs selectable in the GUI
+ALL_PAIRS = [(tx, rx) for tx, rxs in tx_to_rx.items() for rx in rxs]
+
+
+def simulatedFrames(n_frames, pairs):
+    """
+    Returns n_frames raw frames (slow-time x fast-time x channels) of the simulated Walabot.
+
+    """
+    device = SimulatedWalabot(trigger_rate=None, seed=0)
+    lookup = {(p.txAntenna, p.rxAntenna): p for p in device.GetAntennaPairs()}
+    frames = []
+    for _ in range(n_frames):
+        device.Trigger()
+        frames.append(np.column_stack([device.GetSignal(lookup[pair])[0] for pair in pairs]))
+    return np.array(frames)
+
+
+def simulatedSession(duration, rate, pairs, distance=1.0):
+    """
+    Yields (timestamp, frame) of a simulated breathing person for 'duration' seconds at 'rate' Hz, generated as fast
+    as possible with a simulated clock.
+
+    """
+    t = [0.0]
+    device = SimulatedWalabot(chestScene(distance), trigger_rate=None, seed=0, clock=lambda: t[0])
+    lookup = {(p.txAntenna, p.rxAntenna): p for p in device.GetAntennaPairs()}
+    for n in range(int(duration * rate)):
+        t[0] = n / rate
+        device.Trigger()
+        yield t[0], np.column_stack([device.GetSignal(lookup[pair])[0] for pair in pairs])
+
+
+def timePerCall(function, repeats):
+    """
+    Returns the best time of a call of 'function' in seconds.
+
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeats))
+
+
+def checkBasebandEngines(x, rtol=1e-9):
+    """
+    Asserts that every baseband engine equals downsample(downconvert()) within rtol of the signal peak, for a single
+    waveform (1D), a frame (2D) and a block of frames (3D) of the simulated frames x (slow-time x fast-time x
+    channels), and for a fast-time length where FC doesn't fall on a DFT bin (fallback of downsample_rfft()).
+
+    """
+    x = np.asarray(x, dtype=float)
+    n_off_bin = x.shape[1] - 192
+    assert not float(FC * n_off_bin / FS).is_integer()
+    cases = {
+        "1D": x[0, :, 0],
+        "2D": x[0],
+        "3D": x,
+        "off-bin 1D": x[0, :n_off_bin, 0],
+        "off-bin 2D": x[0, :n_off_bin],
+        "off-bin 3D": x[:, :n_off_bin],
+    }
+    for case, signal in cases.items():
+        reference = downsample(downconvert(signal))
+        for name, engine in BASEBAND_ENGINES.items():
+            y = engine(signal)
+            assert y.shape == reference.shape, f"{name}, {case}: shape {y.shape} instead of {reference.shape}"
+            np.testing.assert_allclose(y, reference, rtol=0, atol=rtol * np.max(np.abs(reference)),
+                                       err_msg=f"baseband engine {name} differs from the reference, {case}")
+
+
+def benchmarkBaseband(n_pairs=4, repeats=100):
+    """
+    Compares the baseband engines of processRawSignal() on a simulated frame: the maximum deviation from the
+    reference engine 'fft' relative to the signal peak, and the time per frame. The engines are checked against the
+    reference first (see checkBasebandEngines()).
+
+    """
+    frames = simulatedFrames(3, ALL_PAIRS[:n_pairs])
+    checkBasebandEngines(frames)
+    x = frames[0]
+    reference = processRawSignal(x, engine="fft")
+
+    print(f"Baseband conversion of one frame with {n_pairs} pairs:")
+    for name in BASEBAND_ENGINES:
+        y = processRawSignal(x, engine=name)
+        error = np.max(np.abs(y - reference)) / np.max(np.abs(reference))
+        seconds = timePerCall(lambda: processRawSignal(x, engine=name), repeats)
+        print(f"  {name:>6}: {1e3 * seconds:7.3f} ms, relative error {error:.1e}")
+
+
+def benchmarkBatch(n_frames=100, n_pairs=4, repeats=5):
+    """
+    Compares the baseband conversion of a block of frames one waveform at a time (like the offline scripts), one 
+    frame at a time (like the live pipeline) and batched.
+
+    """
+    x = simulatedFrames(n_frames, ALL_PAIRS[:n_pairs])
+
+    waveforms = timePerCall(lambda: [processRawSignal(frame[:, [l]]) for frame in x for l in range(n_pairs)], repeats)
+    frames = timePerCall(lambda: [processRawSignal(frame) for frame in x], repeats)
+    batch = timePerCall(lambda: processRawSignal(x), repeats)
+
+    print(f"Baseband conversion of {n_frames} frames with {n_pairs} pairs:")
+    print(f"  per waveform: {1e3 * waveforms:7.1f} ms")
+    print(f"  per frame:    {1e3 * frames:7.1f} ms")
+    print(f"  batched:      {1e3 * batch:7.1f} ms")
+
+
+def benchmarkFFTBackends(n_pairs=4, workers=(1, -1), repeats=100):
+    """
+    Compares the FFT backends on the baseband conversion of one frame, each with a single thread and with the given
+    numbers of worker threads. The first call (planning) is not timed.
+
+    """
+    x = simulatedFrames(1, ALL_PAIRS[:n_pairs])[0]
+    previous = getFFTBackend()
+
+    print(f"FFT backends, baseband conversion of one frame with {n_pairs} pairs:")
+    for name in availableBackends():
+        for n_workers in workers:
+            setFFTBackend(name, n_workers)
+            processRawSignal(x)
+            seconds = timePerCall(lambda: processRawSignal(x), repeats)
+            print(f"  {name:>6}, workers {n_workers:>2}: {1e3 * seconds:7.3f} ms")
+
+    setFFTBackend(previous.name, previous.workers)
+
+
+def benchmarkBeamformer(n_pairs=4, grid_N=5, slow_time_N=50, repeats=20):
+    """
+    Compares beamforming a window of baseband frames to a grid of grid_N x grid_N points one point at a time, with
+    the batched steering tensor and with summed beams, without weight cache, and with summed beams from the cache
+    (steady state of the live BREATHING mode). For the MVDR beamformer the covariance update of one frame and the
+    summed beams are timed.
+
+    """
+    pairs = ALL_PAIRS[:n_pairs]
+    signal_matrix = processRawSignal(simulatedFrames(slow_time_N, pairs))
+    pos, _ = antenna_layout.get_channel_positions(pairs)
+    bf = DelaySumBeamformer(pos, np.linspace(F_START, F_STOP, K), cache_size=0)
+    cached = DelaySumBeamformer(pos, np.linspace(F_START, F_STOP, K))
+    points = generateGrid(1.0, 0.1, grid_N)
+
+    loop = timePerCall(lambda: [bf.beamform(signal_matrix, r) for r in points], repeats)
+    batch = timePerCall(lambda: bf.beamform(signal_matrix, points), repeats)
+    summed = timePerCall(lambda: bf.beamform(signal_matrix, points, sum_beams=True), repeats)
+    summed_cached = timePerCall(lambda: cached.beamform(signal_matrix, points, sum_beams=True), repeats)
+    
+    mvdr = MVDRBeamformer(pos, np.linspace(F_START, F_STOP, K))
+    mvdr.update(signal_matrix[0])
+    mvdr_update = timePerCall(lambda: mvdr.update(signal_matrix[-1]), repeats)
+    mvdr_summed = timePerCall(lambda: mvdr.beamform(signal_matrix, points, sum_beams=True), repeats)
+
+    print(f"Beamforming {slow_time_N} frames with {n_pairs} pairs to {len(points)} points:")
+    print(f"  per point:    {1e3 * loop:7.2f} ms")
+    print(f"  batched:      {1e3 * batch:7.2f} ms")
+    print(f"  summed beams: {1e3 * summed:7.2f} ms")
+    print(f"  cached:       {1e3 * summed_cached:7.2f} ms")
+    print(f"  mvdr update:  {1e3 * mvdr_update:7.2f} ms")
+    print(f"  mvdr summed:  {1e3 * mvdr_summed:7.2f} ms")
+
+
+def checkImagingFocus(pairs, distance_m=0.5, steps=10, min_gain=0.8):
+    """
+    Asserts that a point reflector focuses at its voxel for delays between the fast-time bins: the reflector is
+    moved through one range bin in 'steps' and the magnitude of its voxel must stay above 'min_gain' of the coherent
+    sum of the channel peaks.
+
+    """
+    imager = BackprojectionImager(x=[0.0], y=[0.0], workers=1)
+    imager.setPairs(pairs)
+    gains = []
+    for z in distance_m + sample2range(1) * np.arange(steps) / steps:
+        device = SimulatedWalabot([Reflector((0.0, 0.0, z))], trigger_rate=None, noise=0, seed=0)
+        lookup = {(p.txAntenna, p.rxAntenna): p for p in device.GetAntennaPairs()}
+        device.Trigger()
+        frame = processRawSignal(np.column_stack([device.GetSignal(lookup[pair])[0] for pair in pairs]))
+        gains.append(np.abs(imager.image(frame, z)[0, 0]) / np.abs(frame).max(axis=0).sum())
+    assert min(gains) >= min_gain, f"point reflector loses focus between the bins, gains {np.round(gains, 2)}"
+    return np.array(gains)
+
+
+def benchmarkImaging(n_pairs=4, workers=(1, 2, 4), repeats=50):
+    """
+    Times the backprojection of one frame onto the default image grid with the given numbers of worker threads (and
+    all cores) and asserts that the image doesn't depend on the split into blocks and that a point reflector 
+    focuses between the fast-time bins (see checkImagingFocus()).
+
+    """
+    pairs = ALL_PAIRS[:n_pairs]
+    gains = checkImagingFocus(pairs)
+    frame = processRawSignal(simulatedFrames(1, pairs)[0])
+
+    print(f"Backprojection of one frame with {n_pairs} pairs onto {len(IMAGE_X)} x {len(IMAGE_Y)} voxels, "
+          f"{os.cpu_count()} cores, point reflector gain {gains.min():.2f} to {gains.max():.2f} between the bins:")
+    reference = None
+    for n_workers in sorted(set(workers) | {os.cpu_count() or 1}):
+        imager = BackprojectionImager(workers=n_workers)
+        imager.setPairs(pairs)
+        image = imager.image(frame, 1.0)
+        if reference is None:
+            reference = image
+        np.testing.assert_allclose(image, reference, rtol=1e-12, err_msg=f"{n_workers} workers change the image")
+        seconds = timePerCall(lambda: imager.image(frame, 1.0), repeats)
+        print(f"  workers {n_workers:>2}: {1e3 * seconds:7.3f} ms")
+
+
+def breathingRate(f, P):
+    """
+    Returns the frequency (Hz) of the peak of the breathing PSD P in the breathing band.
+
+    """
+    band = (f >= BREATHING_BAND[0]) & (f <= BREATHING_BAND[1])
+    return f[band][np.argmax(P[band])]
+
+
+def benchmarkPrecision(n_pairs=4, duration=60.0, rate=20.0, distance_m=1.0):
+    """
+    Compares the precisions on a simulated breathing person (chestScene()) and asserts that single precision gives
+    the same results as double precision and that both recover the simulated values. The baseband signals are
+    replayed through the live pipeline: the range of the tracker and the breathing rate of the Welch PSD in
+    BREATHING mode, the breathing and heart rate in VITALS mode. The time of the baseband conversion and the
+    beamforming is printed per precision.
+
+    """
+    pairs = ALL_PAIRS[:n_pairs]
+    previous = getPrecision()
+    chest = chestScene(distance_m)[0]
+    truth = {'range': distance_m, 'welch': 60 * chest.breathing_rate, 'breathing': 60 * chest.breathing_rate,
+             'heart': 60 * chest.heart_rate}
+    # half a range bin, one bin of the 2048 point Welch PSD, and the rates of the VITALS mode in 1/min
+    tolerance = {'range': sample2range(0.5), 'welch': 60 * rate / 2048, 'breathing': 0.5, 'heart': 1.0}
+
+    timestamps = []
+    baseband = {name: [] for name in PRECISIONS}
+    raw = None
+    for t, frame in simulatedSession(duration, rate, pairs, distance_m):
+        timestamps.append(t)
+        raw = frame
+        for name in PRECISIONS:
+            setPrecision(name)
+            baseband[name].append(processRawSignal(frame))
+    reference = np.array(baseband["double"])
+
+    print(f"Precision, {duration:.0f} s at {rate:.0f} Hz with {n_pairs} pairs, person at {distance_m:.2f} m, "
+          f"breathing {truth['breathing']:.1f}/min, heart {truth['heart']:.1f}/min:")
+    results = {}
+    try:
+        for name in PRECISIONS:
+            setPrecision(name)
+            signal_matrix = np.array(baseband[name])
+            error = np.max(np.abs(signal_matrix - reference)) / np.max(np.abs(reference))
+            assert error < 1e-4, f"{name}: baseband deviates by {error:.1e} from double precision"
+
+            breathing = ProcessingPipeline(DisplayMode.BREATHING)
+            vitals = ProcessingPipeline(DisplayMode.VITALS)
+            for t, signals in zip(timestamps, signal_matrix):
+                frame = Frame(t, signals, tuple(pairs))
+                breathing.push(frame)
+                vitals.push(frame)
+            _, _, f, P, _ = breathing.plotData()
+            estimate = vitals.vitals.estimate
+            results[name] = {'range': breathing.tracker.range, 'welch': 60 * breathingRate(f, P),
+                             'breathing': estimate.breathing_rate, 'heart': estimate.heart_rate}
+
+            baseband_time = timePerCall(lambda: processRawSignal(raw), 50)
+            beamform_time = timePerCall(lambda: computePlotData(signal_matrix[-50:], DisplayMode.BREATHING, pairs), 20)
+            r = results[name]
+            print(f"  {name:>6}: range {r['range']:.3f} m, breathing {r['welch']:5.2f} (Welch) and "
+                  f"{r['breathing']:5.2f}/min, heart {r['heart']:5.2f}/min, relative error {error:.1e}, "
+                  f"baseband {1e3 * baseband_time:6.3f} ms, beamforming {1e3 * beamform_time:6.3f} ms")
+
+            for key, value in r.items():
+                assert abs(value - truth[key]) <= tolerance[key], \
+                    f"{name}: {key} {value:.3f} instead of {truth[key]:.3f} (tolerance {tolerance[key]:.3f})"
+
+        for key in truth:
+            np.testing.assert_allclose(results["single"][key], results["double"][key], rtol=1e-3, 
+                                       err_msg=f"single precision changes the {key}")
+    finally:
+        setPrecision(previous)
+
+
+def benchmarkDetection(n_pairs=4, duration=10.0, rate=20.0, distance_m=1.0, repeats=1000):
+    """
+    Times the CFAR detectors on the slow-time variance of a simulated breathing person against the argmax.
+
+    """
+    pairs = ALL_PAIRS[:n_pairs]
+    frames = [processRawSignal(frame) for _, frame in simulatedSession(duration, rate, pairs, distance_m)]
+    var = slowVar(np.array(frames))
+
+    print(f"Target detection on {len(var)} range bins, person at {distance_m:.2f} m:")
+    seconds = timePerCall(lambda: distance(var), repeats)
+    print(f"  argmax: {1e6 * seconds:6.1f} us, range {distance(var):.3f} m")
+    for method in CFAR_METHODS:
+        detector = CFARDetector(method)
+        seconds = timePerCall(lambda: detector.detect(var), repeats)
+        ranges = ", ".join(f"{r:.3f}" for r in detector.detect(var)["range"])
+        print(f"  {method:>6}: {1e6 * seconds:6.1f} us, ranges {ranges} m")
+
+
+def benchmarkSpectrum(duration=120.0, rate=20.0, repeats=20):
+    """
+    Times the PSD update per frame over a window of 'duration' seconds: Welch over the whole window against the
+    sliding Welch estimator, which only transforms a segment when it is complete.
+
+    """
+    n = int(duration * rate)
+    x = np.random.default_rng(0).standard_normal(n)
+    welch_time = timePerCall(lambda: getWelch(x, rate), repeats)
+
+    estimator = SlidingWelch(n_segments=(n - 512) // 256 + 1)
+    estimator.update(x)
+    frames = 256
+    sliding_time = timePerCall(lambda: [estimator.update(sample) for sample in x[:frames]], repeats) / frames
+    psd_time = timePerCall(lambda: estimator.psd(rate), repeats)
+
+    print(f"PSD of {duration:.0f} s at {rate:.0f} Hz per frame:")
+    print(f"  welch:   {1e6 * welch_time:8.1f} us")
+    print(f"  sliding: {1e6 * (sliding_time + psd_time):8.1f} us")
+
+
+def benchmarkBandSpectrum(window=1024, rate=20.0, resolution=0.005, repeats=20):
+    """
+    Times the spectrum of the breathing and heart bands over a window of 'window' samples per frame and compares
+    the peak frequency of a tone between the grids: the 2048 point Welch PSD, the sliding DFT bank and the zoom
+    FFT on the band grid with 'resolution' (Hz).
+
+    """
+    t = np.arange(4 * window) / rate
+    tone = 0.2731
+    x = np.sin(2 * np.pi * tone * t) + 0.5 * np.random.default_rng(0).standard_normal(len(t))
+    grid = np.concatenate((bandGrid(BREATHING_BAND, resolution), bandGrid(HEART_BAND, resolution)))
+    breathing = grid < BREATHING_BAND[1] + resolution / 2
+
+    bank = SlidingDFTBank(grid, window)
+    bank.update(x, rate)
+    frames = 256
+    bank_time = timePerCall(lambda: [bank.update(sample, rate) for sample in x[:frames]], repeats) / frames
+    bank.update(x[frames:], rate)
+    welch_time = timePerCall(lambda: getWelch(x[-window:], rate), repeats)
+    zoom_time = timePerCall(lambda: zoomWelch(x[-window:], rate, BREATHING_BAND, resolution, window), repeats)
+
+    f, P = getWelch(x[-window:], rate)
+    band = (f >= BREATHING_BAND[0]) & (f <= BREATHING_BAND[1])
+    f_zoom, P_zoom = zoomWelch(x[-window:], rate, BREATHING_BAND, resolution, window)
+
+    print(f"Band spectrum of {window} samples at {rate:.0f} Hz on {len(grid)} frequencies, tone at {tone} Hz:")
+    print(f"  welch:   {1e6 * welch_time:8.1f} us per frame, peak {f[band][np.argmax(P[band])]:.4f} Hz")
+    peak = peakFrequency(grid[breathing], bank.psd()[breathing])
+    print(f"  sliding: {1e6 * bank_time:8.1f} us per frame, peak {peak:.4f} Hz")
+    print(f"  zoom:    {1e6 * zoom_time:8.1f} us per frame, peak {peakFrequency(f_zoom, P_zoom):.4f} Hz")
+
+
+def benchmarkVitalSigns(duration=60.0, rate=50.0, noise=0.05):
+    """
+    Streams the complex beam sample of the simulated chest (range displacement of chestScene()) with complex noise
+    of relative amplitude 'noise' into the VitalSignEstimator, and reports the time per frame, the rates and
+    confidences of the last estimate and the largest rate errors once the windows are full.
+
+    """
+    chest = chestScene()[0]
+    t = np.arange(int(duration * rate)) / rate
+    displacement = np.linalg.norm([chest.positionAt(ti) for ti in t], axis=1) - chest.position[2]
+    rng = np.random.default_rng(0)
+    samples = np.exp(4j * np.pi * displacement / WAVELENGTH) \
+        + noise * (rng.standard_normal(len(t)) + 1j * rng.standard_normal(len(t))) / np.sqrt(2)
+
+    estimator = VitalSignEstimator()
+    estimates = []
+    start = timeit.default_timer()
+    for ti, sample in zip(t, samples):
+        estimates.append(estimator.update(ti, sample))
+    frame_time = (timeit.default_timer() - start) / len(t)
+
+    rates = np.array([(e.breathing_rate, e.heart_rate) for e in estimates if e is not None])
+    truth = 60 * np.array([chest.breathing_rate, chest.heart_rate])
+    last = estimator.estimate
+    print(f"Vital signs of {duration:.0f} s at {rate:.0f} Hz, latency {estimator.latency[0]:.0f} s (breathing) and "
+          f"{estimator.latency[1]:.0f} s (heart), {1e6 * frame_time:.1f} us per frame:")
+    print(f"  breathing: {last.breathing_rate:5.1f}/min of {truth[0]:.1f}/min, "
+          f"confidence {last.breathing_confidence:.2f}, max error {np.max(np.abs(rates[:, 0] - truth[0])):.2f}/min")
+    print(f"  heart:     {last.heart_rate:5.1f}/min of {truth[1]:.1f}/min, "
+          f"confidence {last.heart_confidence:.2f}, max error {np.max(np.abs(rates[:, 1] - truth[1])):.2f}/min")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the processing stages")
+    parser.add_argument("--pairs", type=int, nargs="+", default=[4, 40], help="numbers of antenna pairs")
+    args = parser.parse_args()
+
+    for n_pairs in args.pairs:
+        benchmarkBaseband(n_pairs)
+        benchmarkBatch(n_pairs=n_pairs)
+        benchmarkFFTBackends(n_pairs)
+        benchmarkBeamformer(n_pairs)
+        benchmarkImaging(n_pairs)
+        benchmarkPrecision(n_pairs)
+        benchmarkDetection(n_pairs)
+    benchmarkSpectrum()
+    benchmarkBandSpectrum()
+    benchmarkVitalSigns()
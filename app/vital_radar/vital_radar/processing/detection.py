@@ -0,0 +1,135 @@
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.optimize import brentq
+
+from vital_radar.processing.distance_estimation import sample2range
+
+
+# available CFAR methods: cell averaging and ordered statistic
+CFAR_METHODS = ("ca", "os")
+
+# one row per detected target: range bin, sub-bin range (m), power and power over the noise estimate
+DETECTION_DTYPE = np.dtype([
+    ("bin", np.int32),
+    ("range", np.float64),
+    ("power", np.float64),
+    ("snr", np.float64),
+])
+
+
+@lru_cache(maxsize=None)
+def caScale(n_train, pfa):
+    """
+    Threshold factor of the CA-CFAR with n_train training cells for the false alarm probability pfa.
+
+    """
+    return n_train * (pfa ** (-1 / n_train) - 1)
+
+
+@lru_cache(maxsize=None)
+def osScale(n_train, rank, pfa):
+    """
+    Threshold factor of the OS-CFAR with n_train training cells, noise estimate of the 'rank'-th smallest
+    (1-based), for the false alarm probability pfa.
+
+    """
+    i = np.arange(rank)
+    log_pfa = np.log(pfa)
+    return brentq(lambda a: np.sum(np.log((n_train - i) / (n_train - i + a))) - log_pfa, 1e-9, 1e9)
+
+
+class CFARDetector:
+    """
+    Constant false alarm rate detector over a range profile (e.g. the slow-time variance per range bin).
+
+    The noise level of every cell is estimated from 'train' cells on each side, skipping 'guard' cells next to it,
+    either as their mean ('ca', with cumulative sums) or as their 'rank'-th smallest value ('os', robust against a
+    second target in the training cells, with a partial sort of the sliding windows). A cell is a target if it is a
+    local maximum above the noise times the factor for the false alarm probability 'pfa'. At the ends the profile
+    is mirrored (it needs more than guard + train cells), so every cell has the same number of training cells.
+
+    """
+    def __init__(self, method="ca", guard=2, train=8, pfa=1e-3, rank=None):
+        if method not in CFAR_METHODS:
+            raise ValueError(f"Unknown CFAR method: {method}")
+        self.method = method
+        self.guard = guard
+        self.train = train
+        self.pfa = pfa
+
+        # cells on each side of the cell under test
+        self.half = guard + train
+        n_train = 2 * train
+        if method == "ca":
+            self.scale = caScale(n_train, pfa)
+        else:
+            self.rank = rank or int(0.75 * n_train)
+            self.scale = osScale(n_train, self.rank, pfa)
+
+        # columns of the training cells in a sliding window of 2 * half + 1 cells
+        self._columns = np.r_[0:train, self.half + guard + 1:2 * self.half + 1]
+
+    def noise(self, profile):
+        """
+        Noise level estimate of every cell of the profile.
+
+        """
+        x = np.asarray(profile, dtype=np.float64)
+        n = len(x)
+        h = self.half
+        x = np.concatenate((x[h:0:-1], x, x[-2:-h - 2:-1]))
+
+        if self.method == "ca":
+            # leading and lagging window sums from the cumulative sum
+            cs = np.zeros(len(x) + 1)
+            np.cumsum(x, out=cs[1:])
+            g, t = self.guard, self.train
+            leading = cs[t:t + n] - cs[:n]
+            lagging = cs[2 * h + 1:2 * h + 1 + n] - cs[h + g + 1:h + g + 1 + n]
+            return (leading + lagging) / (2 * t)
+
+        cells = sliding_window_view(x, 2 * h + 1)[:, self._columns]
+        return np.partition(cells, self.rank - 1, axis=1)[:, self.rank - 1]
+
+    def threshold(self, profile):
+        """
+        Detection threshold of every cell of the profile.
+
+        """
+        return self.scale * self.noise(profile)
+
+    def detect(self, profile):
+        """
+        Detects all targets in the range profile.
+
+        Returns:
+            targets: structured numpy array of DETECTION_DTYPE, strongest target first
+        """
+        x = np.asarray(profile, dtype=np.float64)
+        noise = self.noise(x)
+
+        # local maxima above the threshold
+        peak = x > self.scale * noise
+        peak[1:] &= x[1:] >= x[:-1]
+        peak[:-1] &= x[:-1] > x[1:]
+        k = np.flatnonzero(peak)
+
+        targets = np.empty(len(k), dtype=DETECTION_DTYPE)
+        if not len(k):
+            return targets
+
+        # sub-bin position of the peaks from the parabola through their neighbours
+        l, c, r = x[np.maximum(k - 1, 0)], x[k], x[np.minimum(k + 1, len(x) - 1)]
+        curvature = l - 2 * c + r
+        interior = (k > 0) & (k < len(x) - 1) & (curvature < 0)
+        offset = np.zeros(len(k))
+        offset[interior] = 0.5 * (l - r)[interior] / curvature[interior]
+
+        targets["bin"] = k
+        targets["range"] = sample2range(k + offset)
+        targets["power"] = c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            targets["snr"] = c / noise[k]
+        return targets[np.argsort(-c, kind="stable")]
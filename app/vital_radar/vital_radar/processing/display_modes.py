@@ -3,7 +3,12 @@ from enum import Enum
 import numpy as np
 
 from vital_radar.processing.distance_estimation import slowVar, distance
-from vital_radar.processing.beamformer import DelaySumBeamformer
+from vital_radar.processing.beamformer import DelaySumBeamformer, MVDRBeamformer
+from vital_radar.processing.imaging import BackprojectionImager
+from vital_radar.processing.detection import CFARDetector
+from vital_radar.processing.filters import breathingFilter
+from vital_radar.processing.spectrum_estimation import getWelch, BREATHING_BAND
+from vital_radar.processing.band_spectrum import zoomWelch
 from vital_radar.walabot.antenna_layout import antenna_layout
 
 
@@ -11,6 +16,86 @@ from vital_radar.walabot.antenna_layout import antenna_layout
 K = 137             # number frequency steps
 F_START = 6.3e9     # start freqeuncy
 F_STOP = 8e9        # stop frequency
+FREQS = np.linspace(F_START, F_STOP, K)     # frequency steps
+
+# beam targets of the BREATHING mode relative to the estimated distance (x, y, z) in m, 
+# e.g. generateGrid(0, 0.1, 5) for a 5x5 grid
+BEAM_OFFSETS = np.array([
+    [0, 0, 0],
+    [0.05, 0.05, 0],
+    [0.05, -0.05, 0],
+    [-0.05, 0.05, 0],
+    [-0.05, -0.05, 0],
+])
+
+
+# available beamformers of the BREATHING mode, selected with 'beamformer_type'
+BEAMFORMERS = {
+    "das": DelaySumBeamformer,
+    "mvdr": MVDRBeamformer,
+}
+beamformer_type = "das"
+
+# detector of the targets in the DISTANCE mode
+detector = CFARDetector("ca")
+
+# beamformer and imager reused across calls of the offline path, see getBeamformer() and getImager(), a 
+# ProcessingPipeline owns its own
+_beamformer = None
+_imager = None
+
+
+def setBeamformer(name):
+    """
+    Selects the beamformer used by the BREATHING mode.
+    
+    """
+    global beamformer_type
+    if name not in BEAMFORMERS:
+        raise ValueError(f"Unknown beamformer: {name}")
+    beamformer_type = name
+
+
+def getBeamformerType():
+    return beamformer_type
+
+
+def makeBeamformer(pairs):
+    """
+    Returns a new beamformer of the selected type for the antenna pairs.
+    
+    """
+    # get antenna coordinates
+    pos, pairs = antenna_layout.get_channel_positions(tuple(pairs))
+    return BEAMFORMERS[beamformer_type](pos, FREQS, pairs)
+
+
+def getBeamformer(pairs):
+    """
+    Returns the beamformer of the offline path (computePlotData() without a streamed beamformer) for the selected 
+    antenna pairs. It is kept across calls, so the steering weights cached for the current targets are reused, and 
+    it is replaced when the selection or the type changes. Streams keep their own beamformer (see 
+    ProcessingPipeline), the covariance of an adaptive beamformer belongs to one stream.
+    
+    """
+    global _beamformer
+    pairs = tuple(pairs)
+    if type(_beamformer) is not BEAMFORMERS[beamformer_type] or _beamformer.pairs != pairs:
+        _beamformer = makeBeamformer(pairs)
+    return _beamformer
+
+
+def getImager(pairs):
+    """
+    Returns the backprojection imager of the offline path for the selected antenna pairs, its delay tables are kept 
+    across calls.
+    
+    """
+    global _imager
+    if _imager is None:
+        _imager = BackprojectionImager()
+    _imager.setPairs(pairs)
+    return _imager
 
 
 class DisplayMode(Enum):
@@ -22,11 +107,57 @@ class DisplayMode(Enum):
     IQ = 2
     DISTANCE = 3
     BREATHING = 4
+    IMAGE = 5
+    VITALS = 6
+
+
+def _slowVar(signal_matrix, variance):
+    """
+    Slow-time variance summed over the channels, from the streamed per-channel variance if available.
+    
+    """
+    if variance is None:
+        return slowVar(signal_matrix)
+    return np.sum(variance, axis=1)
+
+
+def beamTargets(d):
+    """
+    Beam targets of the BREATHING mode around the distance d (m).
+    
+    """
+    return BEAM_OFFSETS + np.array([0, 0, d])
+
+
+def breathingTargets(var):
+    """
+    Beam targets of the BREATHING mode around the distance estimated from the slow-time variance.
+    
+    """
+    # estimate distance using variance method, the distance is on the range-bin grid, 
+    # so the targets only change when the maximum moves to another bin
+    return beamTargets(distance(var))
 
 
-def computePlotData(signal_matrix, display_mode, pairs=None):
+def computePlotData(signal_matrix, display_mode, pairs=None, *, timestamps=None, variance=None, mean=None,
+                    breathing=None, vitals=None, beamformer=None, imager=None):
     """
     Defines the computation performed depending on the selected DisplayMode.
+    The state streamed by the ProcessingPipeline is passed by keyword, without it the plot data is computed from 
+    signal_matrix alone.
+    'timestamps' are the acquisition times (s) of the slow-time samples in signal_matrix.
+    'variance' is the slow-time variance of signal_matrix per bin and channel, if it is tracked while streaming 
+    (see RunningVariance), otherwise it is computed with slowVar().
+    'mean' is the slow-time mean of signal_matrix, if it is tracked while streaming, otherwise it is computed here.
+    'breathing' is (timestamps, samples, fs, f, P, spectra) of the filtered breathing signal, its PSD and further
+    spectra {name: (f, P)} on the breathing band, if they are computed while streaming (see BreathingFilter, 
+    SlidingWelch, RecursiveAR and SlidingDFTBank), otherwise the window is beamformed here, its magnitude is 
+    filtered and its spectrum on the band is a zoom FFT. Without a streamed PSD (f, P are None) the PSD of the 
+    samples is estimated here.
+    'vitals' is (timestamps, breathing, heart, estimate, spectra) of the VitalSignEstimator, the rates need tens of
+    seconds of phase history, so the VITALS mode has no data without it.
+    'beamformer' and 'imager' are the ones of the stream, otherwise those of the offline path are used (see 
+    getBeamformer() and getImager()).
     
     """
     match display_mode:
@@ -37,42 +168,60 @@ def computePlotData(signal_matrix, display_mode, pairs=None):
             
         case DisplayMode.DISTANCE:
             # calculate slow time variance
-            return slowVar(signal_matrix)
+            var = _slowVar(signal_matrix, variance)
+            if var is None:
+                return None
             
-        case DisplayMode.BREATHING:
-            # get antenna coordinates
-            pos, pairs = antenna_layout.get_channel_positions(pairs)
+            # all targets above the CFAR threshold
+            return var, detector.detect(var)
             
-            # construct array of frequency steps
-            freqs = np.linspace(F_START, F_STOP, K) 
-
-            # beamformer given these positions and frequencies
-            bf = DelaySumBeamformer(pos, freqs)
-            
-            # estimate distance using variance method
-            var = slowVar(signal_matrix)
-            d = distance(var)
+        case DisplayMode.BREATHING:
+            if breathing is not None:
+                t, x, fs, f, P, spectra = breathing
+            else:
+                # beamformer of the selected pairs, with cached weights
+                bf = getBeamformer(pairs) if beamformer is None else beamformer
+                
+                # beam targets around the distance estimated with the variance method
+                points = breathingTargets(_slowVar(signal_matrix, variance))
+                    
+                # multiply+sum for all beams at once and sum beams
+                B = bf.beamform(signal_matrix, points, sum_beams=True)
+                
+                # collapse to slow time
+                x = np.abs(B).sum(axis=1)
+                
+                # without timestamps assume a rate of 1 Hz
+                if timestamps is None:
+                    timestamps = np.arange(len(x), dtype=float)
+                
+                # filter the whole series on a uniform time grid at the true mean sample rate
+                t, x, fs = breathingFilter(timestamps, x) if len(x) >= 10 else (timestamps, None, float('nan'))
+                f = P = None
+                spectra = {} if x is None else {'Zoom DFT': zoomWelch(x, fs, BREATHING_BAND)}
             
+            # PSD of the samples if no longer one is streamed
+            if f is None and x is not None and len(x) >= 10:
+                f, P = getWelch(x, fs)
             
-            # construct beamforming target from the distance
-            r1 = np.array([0, 0, d])
-            r2 = np.array([0.05, 0.05, d])
-            r3 = np.array([0.05, -0.05, d])
-            r4 = np.array([-0.05, 0.05, d])
-            r5 = np.array([-0.05, -0.05, d])
-                
-            # multiply+sum for each beam
-            B1 = bf.beamform(signal_matrix, r1)
-            B2 = bf.beamform(signal_matrix, r2)
-            B3 = bf.beamform(signal_matrix, r3)
-            B4 = bf.beamform(signal_matrix, r4)
-            B5 = bf.beamform(signal_matrix, r5)
+            return t, x, f, P, spectra
+        
+        case DisplayMode.IMAGE:
+            # remove the static clutter from the newest frame
+            if mean is None:
+                mean = signal_matrix.mean(axis=0)
+            frame = signal_matrix[-1] - mean
             
-            # sum beams
-            B = B1 + B2 + B3 + B4 + B5
+            # cross-range image at the distance estimated with the variance method
+            d = distance(_slowVar(signal_matrix, variance))
+            if imager is None:
+                imager = getImager(pairs)
+            else:
+                imager.setPairs(pairs)
+            image = np.abs(imager.image(frame, d))
             
-            # collapse to slow time
-            x = np.abs(B).sum(axis=1)
-    
-            return x
-        
\ No newline at end of file
+            return image, imager.x, imager.y, d
+        
+        case DisplayMode.VITALS:
+            # estimated while streaming, the window of signal_matrix is too short
+            return vitals
@@ -41,7 +41,7 @@ def slowVar(signal_matrix):
     var = None
     
     if len(signal_matrix) >= 2:
-        # get variance along slow-time axis
+        # get variance along slow-time axis, float32 for complex64 signals
         var = np.var(signal_matrix, axis=0, ddof=0)
         
         # sum the variances of the different antennas
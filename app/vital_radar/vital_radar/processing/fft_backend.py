@@ -0,0 +1,171 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import scipy.fft
+
+
+# maximum number of FFTW plans kept per thread
+MAX_PLANS = 32
+
+
+class NumpyFFT:
+    """
+    FFTs of numpy, single threaded and without plan reuse.
+
+    """
+    name = "numpy"
+
+    def __init__(self, workers=None):
+        self.workers = 1
+
+    def rfft(self, x, axis=-1):
+        return np.fft.rfft(x, axis=axis)
+
+    def fft(self, x, axis=-1):
+        return np.fft.fft(x, axis=axis)
+
+    def ifft(self, x, axis=-1):
+        return np.fft.ifft(x, axis=axis)
+
+
+class ScipyFFT:
+    """
+    FFTs of scipy.fft, split over 'workers' threads (-1 uses all cores).
+
+    """
+    name = "scipy"
+
+    def __init__(self, workers=None):
+        self.workers = workers or 1
+
+    def rfft(self, x, axis=-1):
+        return scipy.fft.rfft(x, axis=axis, workers=self.workers)
+
+    def fft(self, x, axis=-1):
+        return scipy.fft.fft(x, axis=axis, workers=self.workers)
+
+    def ifft(self, x, axis=-1):
+        return scipy.fft.ifft(x, axis=axis, workers=self.workers)
+
+
+class FFTWFFT:
+    """
+    Planned FFTs of FFTW (pyfftw). A plan with its aligned input and output buffers is created once per transform,
+    shape, dtype and axis and reused for every following call. The plans are kept per thread, because they own
+    their buffers.
+
+    """
+    name = "fftw"
+
+    def __init__(self, workers=None):
+        import pyfftw
+        import pyfftw.builders
+
+        self.workers = workers or 1
+        if self.workers < 0:
+            import os
+            self.workers = os.cpu_count() or 1
+
+        self._builders = {
+            'rfft': pyfftw.builders.rfft,
+            'fft': pyfftw.builders.fft,
+            'ifft': pyfftw.builders.ifft,
+        }
+        self._local = threading.local()
+
+        # let scipy.fft (used by scipy.signal) use FFTW as well
+        pyfftw.interfaces.cache.enable()
+        scipy.fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+
+    def _plan(self, kind, x, axis):
+        plans = getattr(self._local, 'plans', None)
+        if plans is None:
+            plans = self._local.plans = {}
+
+        key = (kind, x.shape, x.dtype.str, axis)
+        plan = plans.get(key)
+        if plan is None:
+            if len(plans) >= MAX_PLANS:
+                plans.clear()
+            plan = self._builders[kind](x, axis=axis, threads=self.workers, planner_effort='FFTW_MEASURE',
+                                        avoid_copy=False)
+            plans[key] = plan
+        return plan
+
+    def _execute(self, kind, x, axis):
+        # the output buffer belongs to the plan, copy it before the next call overwrites it
+        return self._plan(kind, x, axis)(x).copy()
+
+    def rfft(self, x, axis=-1):
+        return self._execute('rfft', x, axis)
+
+    def fft(self, x, axis=-1):
+        return self._execute('fft', x, axis)
+
+    def ifft(self, x, axis=-1):
+        return self._execute('ifft', x, axis)
+
+
+# available FFT backends
+BACKENDS = {
+    "numpy": NumpyFFT,
+    "scipy": ScipyFFT,
+    "fftw": FFTWFFT,
+}
+
+# backend used by the processing, select it at startup with setFFTBackend()
+_backend = ScipyFFT()
+
+
+def availableBackends():
+    """
+    Returns the names of the backends that can be used, FFTW only if pyfftw is installed.
+
+    """
+    names = ["numpy", "scipy"]
+    try:
+        import pyfftw
+        names.append("fftw")
+    except ImportError:
+        pass
+    return names
+
+
+def setFFTBackend(name, workers=None):
+    """
+    Selects the FFT backend ('numpy', 'scipy' or 'fftw') and the number of threads per transform.
+
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown FFT backend: {name}")
+    if _backend.name == "fftw" and name != "fftw":
+        scipy.fft.set_global_backend('scipy')
+    _backend = BACKENDS[name](workers)
+
+
+def getFFTBackend():
+    return _backend
+
+
+def rfft(x, axis=-1):
+    return _backend.rfft(x, axis=axis)
+
+
+def fft(x, axis=-1):
+    return _backend.fft(x, axis=axis)
+
+
+def ifft(x, axis=-1):
+    return _backend.ifft(x, axis=axis)
+
+
+@contextmanager
+def scipyWorkers():
+    """
+    Context in which the scipy.fft calls inside scipy.signal use the threads of the selected backend.
+
+    """
+    with scipy.fft.set_workers(_backend.workers):
+        yield
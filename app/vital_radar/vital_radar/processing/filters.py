@@ -0,0 +1,258 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi, sosfiltfilt
+
+from vital_radar.processing.utils import RingBuffer, RunningMean, moving_average, resampleUniform
+
+
+# filter stages of the breathing signal: (order, cutoff in Hz, type)
+BREATHING_HIGHPASS = ((2, 0.1, 'high'),)
+BREATHING_LOWPASS = ((2, 0.6, 'low'),)
+BREATHING_STAGES = BREATHING_HIGHPASS + BREATHING_LOWPASS
+BREATHING_AVERAGE_N = 30    # samples of the moving average before the filters
+
+# relative resolution of the sampling rates the filters are designed for
+FS_RESOLUTION = 0.01
+
+
+def _quantizeFS(fs):
+    """
+    Rounds fs to a grid with the relative step FS_RESOLUTION, so nearby rates share a design.
+
+    """
+    step = np.log1p(FS_RESOLUTION)
+    return float(np.exp(np.round(np.log(fs) / step) * step))
+
+
+@lru_cache(maxsize=64)
+def _sosDesign(stages, fs):
+    sos = np.vstack([butter(order, cutoff, btype=btype, output='sos', fs=fs) for order, cutoff, btype in stages])
+    return sos, sosfilt_zi(sos)
+
+
+def _maxCutoff(stages):
+    return max(np.max(cutoff) for _, cutoff, _ in stages)
+
+
+def sosDesign(stages, fs):
+    """
+    Second-order sections of the cascade of Butterworth 'stages' ((order, cutoff or (low, high), type), ...) at the
+    sampling rate fs (Hz), and their initial state for a unit step (see sosfilt_zi). The designs are cached for fs
+    quantized to FS_RESOLUTION, the arrays are shared and must not be modified.
+
+    Returns:
+        sos: numpy array (sections, 6)
+        zi: numpy array (sections, 2)
+    """
+    stages = tuple((order, tuple(cutoff) if np.ndim(cutoff) else cutoff, btype) for order, cutoff, btype in stages)
+    return _sosDesign(stages, _quantizeFS(fs))
+
+
+class StreamingSOSFilter:
+    """
+    Causal IIR filter of a stream of samples with the cascade of Butterworth 'stages' (see sosDesign). The filter
+    state is carried across calls, so every sample costs O(sections) no matter how long the stream is. Single
+    samples are stepped through the sections directly (transposed direct form II, like sosfilt), which avoids the
+    call overhead of sosfilt.
+
+    The coefficients are only designed again when the sampling rate drifts by more than 'tolerance' (relative) from
+    the rate of the current design. The state then starts over in steady state for the last input, like at the
+    start of the stream, which avoids the transient of a zero state.
+
+    """
+    def __init__(self, stages, tolerance=0.05):
+        self.stages = stages
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.fs = None
+        self.sos = None
+        self.zi = None
+        self._sections = None
+        self._state = None
+
+    def _design(self, fs):
+        """
+        Designs the filter for fs if it is the first rate or drifted too far from the current one.
+
+        """
+        if self.fs is not None and abs(fs - self.fs) <= self.tolerance * self.fs:
+            return False
+        self.fs = fs
+        self.sos, self.zi = sosDesign(self.stages, fs)
+        self._sections = [(b0, b1, b2, a1, a2) for b0, b1, b2, _, a1, a2 in self.sos.tolist()]
+        return True
+
+    def process(self, x, fs):
+        """
+        Filters the new samples x (a scalar or 1D array) at the sampling rate fs (Hz).
+
+        Returns:
+            y: filtered samples, like x
+        """
+        x = np.asarray(x, dtype=float)
+        if self._design(fs) or self._state is None:
+            self._state = (self.zi * x.flat[0]).tolist()
+
+        if x.ndim:
+            y, state = sosfilt(self.sos, x, zi=np.array(self._state))
+            self._state = state.tolist()
+            return y
+
+        y = float(x)
+        for (b0, b1, b2, a1, a2), z in zip(self._sections, self._state):
+            x_in = y
+            y = b0 * x_in + z[0]
+            z[0] = b1 * x_in - a1 * y + z[1]
+            z[1] = b2 * x_in - a2 * y
+        return y
+
+
+class FixedLagSmoother:
+    """
+    Zero-phase filtering of a stream with a fixed delay: the causal output of a StreamingSOSFilter is kept for the
+    last 'lag' samples and filtered again backwards over them, starting in steady state at the newest sample. The
+    backward pass of the sample 'lag' - 1 samples ago is (close to) that of filtfilt over the whole stream once the
+    impulse response of the filter has decayed within 'lag' samples. Every sample costs O(lag) instead of O(stream).
+
+    The backward pass is linear in the last 'lag' samples, so it is a dot product with a kernel computed once per
+    filter design.
+
+    """
+    def __init__(self, stages, lag, tolerance=0.05):
+        self.lag = lag
+        self.filter = StreamingSOSFilter(stages, tolerance)
+        self.forward = RingBuffer(lag)
+        self._kernel = None
+        self._kernel_sos = None
+
+    def reset(self):
+        self.filter.reset()
+        self.forward.clear()
+
+    def kernel(self):
+        """
+        Weights of the last 'lag' forward samples (oldest first) in the backward pass of the oldest one.
+
+        """
+        if self._kernel_sos is not self.filter.sos:
+            # backward pass of every unit sample, newest first, the newest one also sets the initial state
+            impulses = np.eye(self.lag)
+            zi = np.zeros((len(self.filter.sos), self.lag, 2))
+            zi[:, 0] = self.filter.zi
+            backward, _ = sosfilt(self.filter.sos, impulses, axis=1, zi=zi)
+            self._kernel = np.ascontiguousarray(backward[::-1, -1])
+            self._kernel_sos = self.filter.sos
+        return self._kernel
+
+    def process(self, x, fs):
+        """
+        Adds the new sample x at the sampling rate fs (Hz).
+
+        Returns:
+            y: zero-phase filtered sample of 'lag' - 1 samples ago, or None while the first 'lag' samples arrive
+        """
+        self.forward.append(self.filter.process(x, fs))
+        if not self.forward.full:
+            return None
+        return float(self.kernel() @ self.forward.view())
+
+
+class BreathingFilter:
+    """
+    Streaming version of the breathing filter for the slow-time magnitude of the beams, one sample per frame: a
+    moving average of 'average_N' samples, the causal 'highpass' that removes the drift and the 'lowpass', zero-phase
+    with a FixedLagSmoother of 'lag_s' seconds. The high pass is causal because its impulse response is too long for
+    a short lag, the low pass one decays within the lag, so the smoothed output matches filtfilt.
+    The sampling rate is the mean rate of the last 'window' timestamps. The filtered samples and their timestamps,
+    delayed by the moving average and the smoother, are kept for the last 'window' frames.
+
+    """
+    def __init__(self, window, lag_s=2.0, highpass=BREATHING_HIGHPASS, lowpass=BREATHING_LOWPASS,
+                 average_N=BREATHING_AVERAGE_N):
+        self.lag_s = lag_s
+        self.lowpass = lowpass
+        self.max_cutoff = _maxCutoff(highpass + lowpass)
+        self.average = RunningMean(average_N)
+        self.highpass = StreamingSOSFilter(highpass)
+        self.smoother = None
+
+        # input timestamps for the sampling rate, and delayed like the output once the lag is known
+        self.timestamps = RingBuffer(window)
+        self.delayed = None
+
+        # filtered breathing signal and its timestamps
+        self.times = RingBuffer(window)
+        self.values = RingBuffer(window)
+
+    def reset(self):
+        self.average.clear()
+        self.highpass.reset()
+        self.smoother = None
+        self.delayed = None
+        for buffer in (self.timestamps, self.times, self.values):
+            buffer.clear()
+
+    @property
+    def fs(self):
+        """
+        Mean sampling rate (Hz) of the last timestamps, nan for less than two timestamps.
+
+        """
+        if len(self.timestamps) < 2:
+            return float('nan')
+        t = self.timestamps.view()
+        span = t[-1] - t[0]
+        return (len(t) - 1) / span if span > 0 else float('nan')
+
+    def update(self, timestamp, x):
+        """
+        Adds the sample x acquired at 'timestamp' (s).
+
+        Returns:
+            y: filtered sample or None while the filter is still filling up
+        """
+        self.timestamps.append(timestamp)
+        fs = self.fs
+
+        # the low pass cutoff must be below the Nyquist frequency
+        if not np.isfinite(fs) or fs <= 2 * self.max_cutoff:
+            return None
+
+        # the lag of the smoother is fixed in samples at the first rate
+        if self.smoother is None:
+            lag = max(2, int(round(self.lag_s * fs)))
+            self.smoother = FixedLagSmoother(self.lowpass, lag)
+            self.delayed = RingBuffer(lag + (self.average.buffer.capacity - 1) // 2)
+
+        # the moving average and the smoother delay the samples
+        self.delayed.append(timestamp)
+        y = self.smoother.process(self.highpass.process(self.average.update(x), fs), fs)
+        if y is None or not self.delayed.full:
+            return None
+
+        self.times.append(self.delayed.view()[0])
+        self.values.append(y)
+        return y
+
+
+def breathingFilter(t, x, stages=BREATHING_STAGES, average_N=BREATHING_AVERAGE_N):
+    """
+    Filters a whole breathing signal x with jittery timestamps t (s) at once: the series is resampled to a uniform
+    grid, averaged and filtered zero-phase with the cached SOS design of 'stages'.
+
+    Returns:
+        t_uniform: uniform sample times
+        y: filtered series, None if the sampling rate is too low for the filters
+        fs: sampling rate of the uniform grid in Hz
+    """
+    t, x, fs = resampleUniform(t, x)
+    if not np.isfinite(fs) or fs <= 2 * _maxCutoff(stages):
+        return t, None, fs
+
+    sos, _ = sosDesign(stages, fs)
+    y = moving_average(x, average_N)
+    padlen = min(3 * (2 * len(sos) + 1), len(y) - 1)
+    return t, sosfiltfilt(sos, y, padlen=padlen), fs
@@ -0,0 +1,158 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.constants import c
+
+from vital_radar.processing.raw_signal_processing import FS, FC
+from vital_radar.walabot.antenna_layout import antenna_layout
+
+
+# constants
+N_SAMPLES = 8192                    # fast-time samples per raw frame
+FRAME_DURATION = N_SAMPLES / FS     # fast-time span of a frame in s
+
+# default image grid (m): cross-range plane at the target distance
+IMAGE_X = np.linspace(-0.5, 0.5, 41)
+IMAGE_Y = np.linspace(-0.5, 0.5, 41)
+
+# thread pool shared by all imagers, created on first use
+_executor = None
+_executor_workers = 0
+
+
+def _getExecutor(workers):
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backprojection")
+        _executor_workers = workers
+    return _executor
+
+
+class BackprojectionImager:
+    """
+    Backprojects baseband frames (fast-time x channels) onto a grid of voxels.
+
+    Every voxel v gets the sum over the channels of the baseband signal at the bistatic delay
+    tau = (|v - tx| + |v - rx|) / c, linearly interpolated between the fast-time bins (after removing the phase ramp
+    of the baseband bins) and phase corrected by exp(j 2 pi FC tau). Bin indices, interpolation weights and phases are tables per voxel and channel, computed once
+    per pair selection and grid and cached (LRU, 'cache_size' grids), so a frame only costs a gather, a multiply
+    and a sum. The voxels are split into blocks that are computed on a thread pool of 'workers' threads (default:
+    all cores). By default there is one block per worker, but at least 'min_block_size' voxels per block, so the
+    blocks are worth the dispatch. 'block_size' sets a fixed size instead.
+
+    """
+    def __init__(self, x=IMAGE_X, y=IMAGE_Y, block_size=None, workers=None, cache_size=8, min_block_size=256):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.block_size = block_size
+        self.min_block_size = min_block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+
+        self.pairs = None
+        self._tables = OrderedDict()
+
+    def setPairs(self, pairs):
+        """
+        Sets the antenna pairs of the channels, a new selection invalidates the tables.
+
+        """
+        pairs = tuple(pairs)
+        if pairs != self.pairs:
+            self.pairs = pairs
+            self._tables.clear()
+
+    def _channelPositions(self):
+        """
+        Tx and Rx positions of the selected pairs, each (L, 3).
+
+        """
+        return antenna_layout.get_bistatic_positions(self.pairs)
+
+    def _buildTables(self, z, n_bins, dtype):
+        """
+        Computes the gather indices into the flattened (channels x fast-time) frame and the interpolation weights
+        times the phase correction of both neighbouring bins, each (voxels, channels).
+
+        """
+        Z, Y, X = np.meshgrid(z, self.y, self.x, indexing='ij')
+        voxels = np.stack((X.ravel(), Y.ravel(), Z.ravel()), axis=1)
+
+        # bistatic delays (V, L)
+        tx, rx = self._channelPositions()
+        tau = (np.linalg.norm(voxels[:, None, :] - tx[None], axis=2)
+               + np.linalg.norm(voxels[:, None, :] - rx[None], axis=2)) / c
+
+        # fractional fast-time bin of the delays
+        n = tau * n_bins / FRAME_DURATION
+        i0 = np.floor(n).astype(np.int64)
+        frac = n - i0
+        valid = (i0 >= 0) & (i0 + 1 < n_bins)
+
+        # the ifft of the truncated spectrum in downsample() starts at bin -half_M, which leaves a phase ramp of
+        # 2 pi half_M / n_bins (about pi) per bin: derotate both bins before interpolating between them
+        half_M = (n_bins - 1) // 2
+        derotation0 = np.exp(-1j * 2 * np.pi * half_M * i0 / n_bins)
+        derotation1 = np.exp(-1j * 2 * np.pi * half_M * (i0 + 1) / n_bins)
+
+        phase = np.exp(1j * 2 * np.pi * FC * tau)
+        w0 = np.where(valid, (1 - frac) * phase * derotation0, 0).astype(dtype)
+        w1 = np.where(valid, frac * phase * derotation1, 0).astype(dtype)
+
+        # offsets of the channels in the flattened frame
+        index = np.clip(i0, 0, n_bins - 2) + n_bins * np.arange(len(self.pairs))[None, :]
+        return index.astype(np.intp), w0, w1
+
+    def tables(self, z, n_bins, dtype=np.complex128):
+        """
+        Returns the (cached) tables of the grid at the depths z.
+
+        """
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        key = (np.round(z / 1e-3).astype(np.int64).tobytes(), n_bins, np.dtype(dtype).str)
+        tables = self._tables.get(key)
+        if tables is not None:
+            self._tables.move_to_end(key)
+            return tables
+
+        tables = self._buildTables(z, n_bins, dtype)
+        self._tables[key] = tables
+        if len(self._tables) > self.cache_size:
+            self._tables.popitem(last=False)
+        return tables
+
+    def image(self, signals, z):
+        """
+        Backprojects one baseband frame (fast-time x channels) of the selected pairs onto the grid at the depths z.
+
+        Returns:
+            image: complex numpy array (len(z), len(y), len(x)), squeezed to (len(y), len(x)) for a single depth
+        """
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        n_bins = signals.shape[0]
+        dtype = np.result_type(signals.dtype, np.complex64)
+        index, w0, w1 = self.tables(z, n_bins, dtype)
+
+        # channels one after another, so the tables index a flat array
+        frame = np.ascontiguousarray(signals.T, dtype=dtype).ravel()
+
+        # one block per worker, unless the blocks get too small
+        block_size = self.block_size or max(self.min_block_size, -(-len(index) // self.workers))
+
+        def block(start):
+            end = start + block_size
+            i = index[start:end]
+            return np.einsum('vl,vl->v', frame[i], w0[start:end]) + np.einsum('vl,vl->v', frame[i + 1], w1[start:end])
+
+        starts = range(0, len(index), block_size)
+        if self.workers == 1 or len(starts) == 1:
+            voxels = np.concatenate([block(start) for start in starts])
+        else:
+            voxels = np.concatenate(list(_getExecutor(self.workers).map(block, starts)))
+
+        image = voxels.reshape(len(z), len(self.y), len(self.x))
+        return image[0] if len(z) == 1 else image
@@ -0,0 +1,194 @@
+import numpy as np
+
+from vital_radar.processing.display_modes import (DisplayMode, BEAMFORMERS, computePlotData, beamTargets,
+                                                  getBeamformerType, makeBeamformer)
+from vital_radar.processing.imaging import BackprojectionImager
+from vital_radar.processing.raw_signal_processing import processRawSignal, downsample_raw
+from vital_radar.processing.utils import RingBuffer, RunningMean, RunningVariance
+from vital_radar.processing.beamformer import StreamingBeamformer
+from vital_radar.processing.tracking import RangeGateTracker
+from vital_radar.processing.filters import BreathingFilter
+from vital_radar.processing.spectrum_estimation import SlidingWelch, RecursiveAR, BREATHING_BAND, bandGrid
+from vital_radar.processing.band_spectrum import SlidingDFTBank
+from vital_radar.processing.vital_signs import VitalSignEstimator
+from vital_radar.processing.precision import complexDtype
+
+
+class ProcessingPipeline:
+    """
+    Processes acquired frames one by one into the slow-time buffers and computes the plot data of the display mode.
+    Used by the GUI and by the headless replay, so both run exactly the same processing.
+
+    """
+    def __init__(self, display_mode=DisplayMode.RAW, slow_time_N=50, average_N=10):
+        self.display_mode = display_mode
+
+        # last processed signals, averaged into avg_signal_buffer
+        self.average = RunningMean(average_N)
+        self.signal_buffer = self.average.buffer
+        
+        # averaged signals and their slow-time variance, updated per frame
+        self.slow_time = RunningVariance(slow_time_N)
+        self.avg_signal_buffer = self.slow_time.buffer
+
+        # range gate of the target and the BREATHING beams inside it of the frames in avg_signal_buffer, 
+        # each frame is beamformed once
+        self.tracker = RangeGateTracker()
+        self.beams = StreamingBeamformer(slow_time_N)
+
+        # beamformer and imager of this stream, the covariance of an adaptive beamformer only holds frames of this
+        # stream since the last reset
+        self.beamformer = None
+        self.imager = BackprojectionImager()
+        
+        # breathing signal filtered from the beams, one sample per frame, its PSD over the last segments and its AR 
+        # and sliding DFT spectra on the breathing band
+        self.breathing = BreathingFilter(slow_time_N)
+        self.spectrum = SlidingWelch()
+        self.breathing_grid = bandGrid(BREATHING_BAND)
+        self.ar = RecursiveAR(1024)
+        self.bank = SlidingDFTBank(self.breathing_grid, 1024)
+
+        # breathing and heart rate from the phase of the beam at the target in VITALS mode, beamformed from the 
+        # frames in signal_buffer: the running mean has nulls at multiples of fs / average_N, which fall into the 
+        # heart band at low trigger rates
+        self.vitals = VitalSignEstimator()
+
+        # acquisition times of the frames in avg_signal_buffer
+        self.time_buffer = RingBuffer(slow_time_N)
+
+        # antenna pairs of the frames currently in the buffers
+        self.pairs = ()
+
+    def reset(self):
+        """
+        Empties all slow-time buffers and drops the beamformer (with the covariance of an adaptive beamformer) and 
+        the imager.
+
+        """
+        self.average.clear()
+        self.slow_time.clear()
+        self.tracker.reset()
+        self.beams.clear()
+        self.beamformer = None
+        self.imager = BackprojectionImager()
+        self.breathing.reset()
+        self.spectrum.clear()
+        self.ar.clear()
+        self.bank.clear()
+        self.vitals.reset()
+        self.time_buffer.clear()
+
+    def setDisplayMode(self, display_mode):
+        self.display_mode = display_mode
+        self.reset()
+
+    def push(self, frame):
+        """
+        Processes a single acquired frame and appends it to the signal buffers.
+
+        """
+        # frames acquired before a selection change don't fit the buffers anymore
+        if frame.pairs != self.pairs:
+            self.reset()
+            self.pairs = frame.pairs
+
+        if np.iscomplexobj(frame.signals):
+            # recorded frames may already be in baseband
+            signals = frame.signals.astype(complexDtype(), copy=False)
+        elif self.display_mode == DisplayMode.RAW:
+            # for RAW dislplay mode the signals arent processed
+            signals = downsample_raw(frame.signals, 10)
+        else:
+            # for all other modes the IQ signals are used
+            signals = processRawSignal(frame.signals)
+
+        # append signals to signal buffer and average
+        avg_signal = self.average.update(signals)
+        self.slow_time.update(avg_signal)
+        
+        if self.display_mode in (DisplayMode.BREATHING, DisplayMode.VITALS):
+            # the covariance of an adaptive beamformer is estimated from the frames it is applied to: the averaged 
+            # frames in BREATHING mode, the un-averaged frames in VITALS mode
+            bf = self._beamformer()
+            bf.update(signals if self.display_mode == DisplayMode.VITALS else avg_signal)
+            
+            # beamform the new frame inside the range gate, the targets only move with the gate
+            var = self.slow_time.variance
+            if var is not None:
+                gate = self.tracker.update(np.sum(var, axis=1), frame.timestamp)
+                points = beamTargets(self.tracker.gate_range)
+                if self.display_mode == DisplayMode.VITALS:
+                    self._pushVitals(frame.timestamp, bf, points)
+                else:
+                    self.beams.push(bf, avg_signal, points, self.avg_signal_buffer, gate)
+                    y = self.breathing.update(frame.timestamp, self.beams.magnitude.latest())
+                    if y is not None:
+                        self.spectrum.update(y)
+                        self.ar.update(y)
+                        self.bank.update(y, self.breathing.fs)
+        
+        self.time_buffer.append(frame.timestamp)
+
+    def _beamformer(self):
+        """
+        Beamformer of the selected type for the pairs of the stream, built on first use after a reset.
+
+        """
+        if type(self.beamformer) is not BEAMFORMERS[getBeamformerType()]:
+            self.beamformer = makeBeamformer(self.pairs)
+        return self.beamformer
+
+    def _pushVitals(self, timestamp, beamformer, points):
+        """
+        Feeds the complex beam of the newest un-averaged frame at the center of the range gate into the vital sign 
+        estimator. The frame before is beamformed with the same weights and the phase step is taken to it, so moving 
+        the gate or the targets doesn't cause a phase jump.
+
+        """
+        center = self.tracker.center
+        frames = self.signal_buffer.view()[-2:]
+        beam = beamformer.beamform(frames, points, sum_beams=True, bins=slice(center, center + 1))[:, 0]
+        previous = beam[-2] if len(beam) > 1 else None
+        self.vitals.update(timestamp, beam[-1], previous)
+
+    def plotData(self):
+        """
+        Returns the plot data of the current display mode, or None if no frame was processed yet.
+
+        """
+        if not self.avg_signal_buffer:
+            return None
+
+        # chronological view of the buffer, without copying
+        signal_matrix = self.avg_signal_buffer.view()
+
+        return computePlotData(signal_matrix, self.display_mode, self.pairs, timestamps=self.time_buffer.view().copy(),
+                               variance=self.slow_time.variance, mean=self.slow_time.mean,
+                               breathing=self._breathing(), vitals=self._vitals(), beamformer=self.beamformer,
+                               imager=self.imager)
+
+    def _breathing(self):
+        """
+        Streamed breathing signal, its PSD and band spectra (timestamps, samples, fs, f, P, spectra) in BREATHING mode.
+
+        """
+        if self.display_mode != DisplayMode.BREATHING:
+            return None
+        b = self.breathing
+        spectra = {}
+        for name, P in (('AR', self.ar.psd(self.breathing_grid, b.fs)), ('Sliding DFT', self.bank.psd())):
+            if P is not None:
+                spectra[name] = (self.breathing_grid, P)
+        return (b.times.view().copy(), b.values.view().copy(), b.fs) + self.spectrum.psd(b.fs) + (spectra,)
+
+    def _vitals(self):
+        """
+        Filtered displacements, the latest estimate and the band spectra (timestamps, breathing, heart, estimate,
+        spectra) in VITALS mode.
+
+        """
+        if self.display_mode != DisplayMode.VITALS:
+            return None
+        v = self.vitals
+        return v.times.view().copy(), v.breathing.view().copy(), v.heart.view().copy(), v.estimate, v.spectra()
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+# floating point precision of the processing: (raw dtype, baseband dtype)
+PRECISIONS = {
+    "double": (np.float64, np.complex128),
+    "single": (np.float32, np.complex64),
+}
+
+# precision used by the processing, select it at startup with setPrecision()
+_precision = "double"
+
+
+def setPrecision(name):
+    """
+    Selects the precision of the raw frames, the baseband signals and all buffers and results computed from them.
+    'single' keeps raw frames in float32 and baseband signals in complex64, which halves the memory traffic.
+    Select it before the acquisition starts, the buffers are allocated with the precision at that time.
+
+    """
+    global _precision
+    if name not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {name}")
+    _precision = name
+
+
+def getPrecision():
+    return _precision
+
+
+def realDtype():
+    """
+    Returns the dtype of the raw frames.
+
+    """
+    return np.dtype(PRECISIONS[_precision][0])
+
+
+def complexDtype():
+    """
+    Returns the dtype of the baseband signals.
+
+    """
+    return np.dtype(PRECISIONS[_precision][1])
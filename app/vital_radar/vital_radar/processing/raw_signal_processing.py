@@ -1,75 +1,200 @@
+from functools import lru_cache
+
 import numpy as np
 
+from vital_radar.processing import fft_backend
+from vital_radar.processing.precision import realDtype, complexDtype
+
 
 # constants
 FS = 102.4e9  # sampling frequency
 FC = 7.15e9    # carrier frequency
 B = 1.7e9      # bandwidth
 
+# baseband engine used by processRawSignal(), see BASEBAND_ENGINES
+baseband_engine = "rfft"
+
+# maximum size of the raw frames converted in one call, larger blocks are split into chunks
+MAX_CHUNK_BYTES = 4 * 2**20
+
+
+def fastTimeAxis(x):
+    """
+    Returns the fast-time axis of a signal: 0 for 1D (fast-time) and 2D (fast-time x channels),
+    1 for 3D blocks (slow-time x fast-time x channels).
+    
+    """
+    return 1 if x.ndim == 3 else 0
+
+
+def _alongAxis(v, x, axis):
+    """
+    Reshapes the 1D array v so that it broadcasts along 'axis' of x.
+    
+    """
+    shape = [1] * x.ndim
+    shape[axis] = -1
+    return v.reshape(shape)
+
+
+def _sliceAxis(x, axis, start, end):
+    """
+    Returns x[start:end] along 'axis'.
+    
+    """
+    index = [slice(None)] * x.ndim
+    index[axis] = slice(start, end)
+    return x[tuple(index)]
+
 
 def downconvert(x):
     """
     Downconversion of a signal at carrier frequency FC to baseband.
-    Handles both 1D (single signal) and 2D input.
+    Handles 1D (single signal), 2D and 3D input.
     """
-    N = x.shape[0]
-    n = np.arange(N)
-
-    carrier = np.exp(-1j * 2 * np.pi * FC * n / FS).reshape(-1, 1)
+    axis = fastTimeAxis(x)
+    N = x.shape[axis]
+    carrier = _carrier(N, np.result_type(x.dtype, np.complex64))
     
-    x_baseband = x * carrier
+    x_baseband = x * _alongAxis(carrier, x, axis)
     return x_baseband
 
 
+@lru_cache(maxsize=8)
+def _carrier(N, dtype=np.complex128):
+    """
+    Complex carrier of N samples, computed once per signal length and precision.
+    
+    """
+    n = np.arange(N)
+    return np.exp(-1j * 2 * np.pi * FC * n / FS).astype(dtype)
+
+
 def downsample(x):
     """
     Performs downsampling of a signal by truncating around -bandwidth to +bandwidth in frequency domain
-    Handles both 1D and 2D input
+    Handles 1D, 2D and 3D input
     """
-    N = x.shape[0]
+    axis = fastTimeAxis(x)
+    N = x.shape[axis]
     
     # transform to frequency domain
-    X = np.fft.fft(x, axis=0)
+    X = fft_backend.fft(x, axis=axis)
     
     # calculate the number of samples in the radar bandwidth
     M = int(np.round(N * B / FS))
     
     # shift zero to middle of frequency axis
-    X_shifted = np.fft.fftshift(X, axes=0)
+    X_shifted = np.fft.fftshift(X, axes=axis)
     
     # truncate, so that only the radar bandwidth is left
     center = N // 2
     half_M = M // 2
     start = center - half_M
     end = center + half_M + 1
-    Y_truncated = X_shifted[start:end, :]
+    Y_truncated = _sliceAxis(X_shifted, axis, start, end)
+    
+    # transform back to time domain
+    y_downsampled = fft_backend.ifft(Y_truncated, axis=axis) * (M + 1) / N   
+    return y_downsampled
+
+
+def downsample_rfft(x):
+    """
+    Downconversion and downsampling in one step, equal to downsample(downconvert(x)) for real signals.
+    Shifting by the carrier moves the DFT bin of FC to zero, so the truncated baseband bins are the bins around FC 
+    of the real input. They are taken directly from an rfft, without the complex multiply and at half the FFT cost.
+    Requires FC to fall on a DFT bin (FC * N / FS integer), otherwise the reference path is used.
+    Handles 1D, 2D and 3D input
+    """
+    axis = fastTimeAxis(x)
+    N = x.shape[axis]
+    
+    # DFT bin of the carrier frequency
+    kc = FC * N / FS
+    if not np.isclose(kc, np.round(kc)):
+        return downsample(downconvert(x))
+    kc = int(np.round(kc))
+    
+    # calculate the number of samples in the radar bandwidth
+    M = int(np.round(N * B / FS))
+    half_M = M // 2
+    
+    # bins -half_M..half_M around the carrier, in the order of the shifted baseband spectrum
+    Y_truncated = _sliceAxis(fft_backend.rfft(x, axis=axis), axis, kc - half_M, kc + half_M + 1)
     
     # transform back to time domain
-    y_downsampled = np.fft.ifft(Y_truncated, axis=0) * (M + 1) / N   
+    y_downsampled = fft_backend.ifft(Y_truncated, axis=axis) * (M + 1) / N
     return y_downsampled
 
 
+def downsample_fft(x):
+    """
+    Reference baseband path: explicit downconversion with the complex carrier followed by downsample().
+    
+    """
+    return downsample(downconvert(x))
+
+
+# available implementations of the baseband conversion, selected with 'baseband_engine'
+BASEBAND_ENGINES = {
+    "fft": downsample_fft,
+    "rfft": downsample_rfft,
+}
+
+
+def setBasebandEngine(name):
+    """
+    Selects the implementation of the baseband conversion used by processRawSignal().
+    
+    """
+    global baseband_engine
+    if name not in BASEBAND_ENGINES:
+        raise ValueError(f"Unknown baseband engine: {name}")
+    baseband_engine = name
+
+
 def downsample_raw(x, factor):
     """
     Simple downsampling of the raw RF signal by integer factor, without downconversion.
     Keeps every nth sample to reduce resolution and computational load.
-    Handles both 1D and 2D input.
+    Handles 1D, 2D and 3D input.
     """
     x = np.array(x)
     if x.ndim == 1:
         return x[::factor]
     elif x.ndim == 2:
         return x[::factor, :]
+    elif x.ndim == 3:
+        return x[:, ::factor, :]
     else:
-        raise ValueError("Input must be 1D or 2D array")
+        raise ValueError("Input must be 1D, 2D or 3D array")
     
     
-def processRawSignal(x):
+def processRawSignal(x, engine=None):
     """
     Processes raw signals (multiple in columns) from the Walabot API to numpy array,
     downconverted to baseband and downsampled.
+    A 3D block of frames (slow-time x fast-time x channels) is converted with one FFT call along the fast-time axis
+    per chunk of at most MAX_CHUNK_BYTES, so memory mapped recordings are only read chunk by chunk.
+    'engine' selects the implementation (see BASEBAND_ENGINES), default is 'baseband_engine'.
+    The signals are processed in the precision selected with setPrecision().
     """
-    x = np.array(x)
-    x_bb = downconvert(x)
-    x_ds = downsample(x_bb)
+    engine = BASEBAND_ENGINES[engine or baseband_engine]
+    convert = lambda x: engine(np.asarray(x, dtype=realDtype())).astype(complexDtype(), copy=False)
+    
+    if np.ndim(x) != 3:
+        return convert(x)
+    
+    # number of frames per chunk
+    frames = len(x)
+    chunk = max(1, MAX_CHUNK_BYTES // max(x[0].nbytes, 1))
+    if chunk >= frames:
+        return convert(x)
+    
+    first = convert(x[:chunk])
+    x_ds = np.empty((frames,) + first.shape[1:], dtype=first.dtype)
+    x_ds[:chunk] = first
+    for start in range(chunk, frames, chunk):
+        x_ds[start:start + chunk] = convert(x[start:start + chunk])
     return x_ds
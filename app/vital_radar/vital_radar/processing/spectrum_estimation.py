@@ -1,6 +1,24 @@
 import numpy as np
-from scipy.signal import butter, filtfilt, welch, freqz
-from statsmodels.regression.linear_model import yule_walker
+from scipy.signal import sosfiltfilt, welch, freqz, get_window
+
+from vital_radar.processing import fft_backend
+from vital_radar.processing.fft_backend import scipyWorkers
+from vital_radar.processing.filters import sosDesign
+from vital_radar.processing.utils import RingBuffer, RunningMean
+
+
+# frequency bands of the vital signs in Hz: 6 to 30 breaths and 48 to 120 beats per minute
+BREATHING_BAND = (0.1, 0.5)
+HEART_BAND = (0.8, 2.0)
+
+
+def bandGrid(band, resolution=0.005):
+    """
+    Frequency grid (Hz) of a band with the given resolution (Hz), to evaluate spectra only where the vital signs are.
+
+    """
+    low, high = band
+    return np.linspace(low, high, int(round((high - low) / resolution)) + 1)
 
 
 def getWelch(x, fs, nfft=2048):
@@ -11,35 +29,269 @@ def getWelch(x, fs, nfft=2048):
     nperseg = min(512, len(x))
     noverlap = int(nperseg * 0.5)
     
-    f, P = welch(x, fs=fs,
-                 window='hann',
-                 nperseg=nperseg,
-                 noverlap=noverlap,
-                 nfft=nfft,
-                 average='mean')
+    with scipyWorkers():
+        f, P = welch(x, fs=fs,
+                     window='hann',
+                     nperseg=nperseg,
+                     noverlap=noverlap,
+                     nfft=nfft,
+                     average='mean')
     
     return f, P
 
 
+class SlidingWelch:
+    """
+    Welch PSD of a stream over the last 'n_segments' segments, with the parameters of getWelch() (Hann window,
+    segments of 'nperseg' samples overlapping by 'noverlap', 'nfft' point FFT, constant detrend, density scaling).
+
+    New samples are collected until the next segment is complete, only then its windowed periodogram is computed. The
+    periodograms are averaged with a running mean, so a new sample costs O(1) and a completed segment one FFT,
+    instead of all segments of the window per estimate. With the sampling rate of the stream, psd() equals welch()
+    over the samples of the averaged segments.
+
+    """
+    def __init__(self, n_segments=8, nperseg=512, noverlap=256, nfft=2048):
+        if not 0 <= noverlap < nperseg <= nfft:
+            raise ValueError("Need 0 <= noverlap < nperseg <= nfft")
+        self.nperseg = nperseg
+        self.step = nperseg - noverlap
+        self.nfft = nfft
+
+        self.window = get_window('hann', nperseg)
+        # one-sided: every bin but DC (and Nyquist for even nfft) counts twice
+        self.weights = np.full(nfft // 2 + 1, 2.0 / np.sum(self.window ** 2))
+        self.weights[0] /= 2
+        if nfft % 2 == 0:
+            self.weights[-1] /= 2
+
+        self.samples = RingBuffer(nperseg)
+        self.periodograms = RunningMean(n_segments)
+        self._pending = nperseg
+        self._frame = np.zeros(nfft)
+
+    def __len__(self):
+        """
+        Number of averaged segments.
+
+        """
+        return len(self.periodograms)
+
+    def clear(self):
+        self.samples.clear()
+        self.periodograms.clear()
+        self._pending = self.nperseg
+
+    def update(self, x):
+        """
+        Adds new samples x (a scalar or 1D array) to the stream.
+
+        """
+        for sample in np.atleast_1d(np.asarray(x, dtype=float)):
+            self.samples.append(sample)
+            self._pending -= 1
+            if self._pending == 0:
+                self._addSegment()
+                self._pending = self.step
+
+    def _addSegment(self):
+        segment = self.samples.view()
+        self._frame[:self.nperseg] = (segment - segment.mean()) * self.window
+        X = fft_backend.rfft(self._frame)
+        self.periodograms.update(self.weights * (X.real ** 2 + X.imag ** 2))
+
+    def psd(self, fs):
+        """
+        Returns the PSD of the stream sampled at fs (Hz).
+
+        Returns:
+            f: frequencies in Hz, None before the first segment is complete
+            P: PSD, None before the first segment is complete
+        """
+        if not len(self):
+            return None, None
+        return np.fft.rfftfreq(self.nfft, 1 / fs), self.periodograms.mean / fs
+
+
+def levinsonDurbin(r, order):
+    """
+    Solves the Yule-Walker equations of the autocovariance r (lags 0 to at least 'order') for all AR orders up to
+    'order' with the Levinson-Durbin recursion, in O(order^2).
+
+    Returns:
+        a: numpy array (order + 1, order + 1), row p are the coefficients [1, a_1, ..., a_p] of the AR(p) model
+           x[n] + sum_k a_k x[n-k] = e[n], zero padded
+        sigma2: numpy array (order + 1,), variance of the prediction error e of every order
+    """
+    # the recursion on floats, numpy only pays off for much higher orders
+    r = np.asarray(r, dtype=float)[:order + 1].tolist()
+    rows = [[1.0]]
+    errors = [r[0]]
+    for p in range(1, order + 1):
+        prev, error = rows[-1], errors[-1]
+        if error <= 0:
+            # perfectly predictable, the higher orders don't improve the fit
+            break
+        k = -(r[p] + sum(c * r[p - i] for i, c in enumerate(prev[1:], 1))) / error
+        rows.append([1.0] + [prev[i] + k * prev[p - i] for i in range(1, p)] + [k])
+        errors.append(error * (1 - k * k))
+    
+    # orders after a perfect fit repeat it
+    rows += [rows[-1]] * (order + 1 - len(rows))
+    errors += [errors[-1]] * (order + 1 - len(errors))
+    
+    a = np.zeros((order + 1, order + 1))
+    for p, row in enumerate(rows):
+        a[p, :len(row)] = row
+    return a, np.array(errors)
+
+
+def aicOrder(sigma2, n_samples):
+    """
+    AR order with the smallest Akaike information criterion n log(sigma2_p) + 2p, from the prediction error
+    variances of levinsonDurbin().
+
+    """
+    p = np.arange(1, len(sigma2))
+    with np.errstate(divide='ignore'):
+        aic = n_samples * np.log(sigma2[1:]) + 2 * p
+    return int(p[np.argmin(aic)])
+
+
+def autocovariance(x, max_lag):
+    """
+    Biased (divided by the length) autocovariance of x for the lags 0 to max_lag, like the 'mle' Yule-Walker fit.
+
+    """
+    x = np.asarray(x, dtype=float)
+    x = x - x.mean()
+    n = len(x)
+    return np.array([x[k:] @ x[:n - k] for k in range(max_lag + 1)]) / n
+
+
+def arPSD(a, sigma2, f, fs):
+    """
+    One-sided PSD (density, like welch()) of the AR model with coefficients a = [1, a_1, ..., a_p] and prediction
+    error variance sigma2 at the frequencies f (Hz).
+
+    """
+    # A(z) at z = exp(j 2 pi f / fs), with the powers of z^-1 as columns
+    A = np.vander(np.exp(-2j * np.pi * np.asarray(f) / fs), len(a), increasing=True) @ a
+    return 2 * sigma2 / (fs * np.abs(A) ** 2)
+
+
+class RecursiveAR:
+    """
+    AR spectrum of the last 'window' samples of a stream, with the order up to 'max_order' selected by AIC.
+
+    The lag products sum_n x[n] x[n-k] of the window are updated per sample: the products of a new sample are added
+    and those of the sample leaving the window are subtracted, O(max_order) per sample. The autocovariance (mean
+    removed, biased) follows from them and the sums at both ends of the window, the fit is a Levinson-Durbin
+    recursion that yields the prediction errors of all orders for the AIC at once. The lag products are recomputed
+    from the window every 'recompute_every' samples, so rounding errors don't accumulate.
+    The spectrum is only evaluated on the given frequency grid, e.g. bandGrid(BREATHING_BAND).
+
+    """
+    def __init__(self, window, max_order=16, recompute_every=1000):
+        if window <= max_order:
+            raise ValueError("window must be longer than max_order")
+        self.max_order = max_order
+        self.recompute_every = recompute_every
+        self.samples = RingBuffer(window)
+        self.clear()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def clear(self):
+        self.samples.clear()
+        self._products = np.zeros(self.max_order + 1)
+        self._sum = 0.0
+        self._updates = 0
+
+    def update(self, x):
+        """
+        Adds new samples x (a scalar or 1D array) to the window.
+
+        """
+        m = self.max_order + 1
+        for sample in np.atleast_1d(np.asarray(x, dtype=float)):
+            if self.samples.full:
+                old = self.samples.view()
+                self._products -= old[0] * old[:m]
+                self._sum -= old[0]
+            self.samples.append(sample)
+            self._sum += sample
+
+            w = self.samples.view()
+            n = min(m, len(w))
+            self._products[:n] += sample * w[:-n - 1:-1]
+
+            self._updates += 1
+            if self._updates % self.recompute_every == 0:
+                self._recompute()
+
+    def _recompute(self):
+        w = self.samples.view()
+        n = len(w)
+        self._products = np.array([w[k:] @ w[:n - k] if k < n else 0.0 for k in range(self.max_order + 1)])
+        self._sum = float(w.sum())
+
+    def autocovariance(self):
+        """
+        Biased autocovariance of the window for the lags 0 to max_order.
+
+        """
+        w = self.samples.view()
+        n = len(w)
+        k = np.arange(self.max_order + 1)
+        mean = self._sum / n
+
+        # sums of the first and the last k samples of the window
+        first = np.concatenate(([0.0], np.cumsum(w[:self.max_order])))
+        last = np.concatenate(([0.0], np.cumsum(w[:-self.max_order - 1:-1])))
+        return (self._products - mean * (2 * self._sum - first - last) + (n - k) * mean ** 2) / n
+
+    def fit(self):
+        """
+        Fits the AR model of the AIC order to the window.
+
+        Returns:
+            a: coefficients [1, a_1, ..., a_p]
+            sigma2: prediction error variance
+        """
+        a, sigma2 = levinsonDurbin(self.autocovariance(), self.max_order)
+        p = aicOrder(sigma2, len(self))
+        return a[p, :p + 1], sigma2[p]
+
+    def psd(self, f, fs):
+        """
+        AR spectrum (one-sided density) of the window at the frequencies f (Hz) of the stream sampled at fs (Hz),
+        None while the window is shorter than max_order + 1 samples.
+
+        """
+        if len(self) <= self.max_order:
+            return None
+        return arPSD(*self.fit(), f, fs)
+
+
 def getARpsd(x, fs, order=8, nfft=512):
     """
     Estimate the PSD of x using an AR fit of given order.
 
     """
-    # 1) Fit AR model via Yule–Walker
-    #    rho: AR coefficients (without the leading 1)
+    # 1) Fit AR model via Yule–Walker, solved by the Levinson-Durbin recursion
+    #    a: coefficients so that x[n] + sum a_k x[n-k] = noise
     #    sigma2: estimated white‐noise variance
-    rho, sigma2 = yule_walker(x, order=order, method='mle')
-    
-    # 2) Build the full filter A(z) = 1 - sum_{k=1}^p rho[k-1] z^-k
-    #    (statsmodels returns coefficients so that x[n] + sum rho*x[n-k] = noise)
-    a = np.concatenate(([1.0], -rho))
+    a, sigma2 = levinsonDurbin(autocovariance(x, order), order)
+    a, sigma2 = a[order], sigma2[order]
     
-    # 3) Compute frequency response of 1/A(z)
+    # 2) Compute frequency response of 1/A(z)
     #    We use freqz on the denominator 'a', numerator = [1].
-    w, h = freqz(b=[1.0], a=a, worN=nfft, fs=fs)
+    with scipyWorkers():
+        w, h = freqz(b=[1.0], a=a, worN=nfft, fs=fs)
     
-    # 4) PSD = sigma2 * |H(e^{jω})|^2
+    # 3) PSD = sigma2 * |H(e^{jω})|^2
     Pxx = sigma2 * (np.abs(h) ** 2)
     
     # Return only the one‐sided spectrum up to fs/2
@@ -49,10 +301,8 @@ def getARpsd(x, fs, order=8, nfft=512):
 
 def bandpassFilter(x, fs, lowcut=0.1, highcut=0.5, order=4):
     """
-    Bandpass-filter x between lowcut and highcut (Hz) using an Nth-order Butterworth.
+    Bandpass-filter x between lowcut and highcut (Hz) using an Nth-order Butterworth, zero-phase with the cached
+    second-order sections of the design (see sosDesign).
     """
-    nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    b, a = butter(order, [low, high], btype='band')
-    return filtfilt(b, a, x)
+    sos, _ = sosDesign(((order, (lowcut, highcut), 'band'),), fs)
+    return sosfiltfilt(sos, x)
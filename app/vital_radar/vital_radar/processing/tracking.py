@@ -0,0 +1,136 @@
+import numpy as np
+
+from vital_radar.processing.distance_estimation import sample2range
+
+
+def peakInterpolation(y, k):
+    """
+    Sub-bin position of the peak at bin k of y, from the parabola through the bins k-1, k and k+1.
+
+    """
+    if k <= 0 or k >= len(y) - 1:
+        return float(k)
+    left, center, right = y[k - 1], y[k], y[k + 1]
+    curvature = left - 2 * center + right
+    if curvature >= 0:
+        return float(k)
+    return float(k + 0.5 * (left - right) / curvature)
+
+
+class RangeGateTracker:
+    """
+    Tracks the target range on the slow-time variance profile (one value per range bin) and outputs a stable gate
+    of range bins around it, so the downstream processing only has to look at these bins.
+
+    The measurement is the strongest bin inside the current gate, refined by parabolic interpolation, and is
+    smoothed by an alpha-beta filter (range in bins and its rate in bins/s). A stronger peak outside of the gate is
+    only taken over if it exceeds the peak inside by 'hysteresis' for 'confirm' frames in a row. The gate of
+    2 * half_width + 1 bins is only re-centered when the track is more than half_width / 2 bins away from its center.
+
+    """
+    def __init__(self, half_width=3, alpha=0.5, beta=0.1, hysteresis=2.0, confirm=5):
+        self.half_width = half_width
+        self.alpha = alpha
+        self.beta = beta
+        self.hysteresis = hysteresis
+        self.confirm = confirm
+        self.reset()
+
+    def reset(self):
+        # filtered range (bins) and rate (bins/s) of the track
+        self.position = None
+        self.velocity = 0.0
+
+        # center bin of the gate and number of profile bins
+        self.center = None
+        self.n_bins = 0
+
+        # peak outside of the gate that is waiting for confirmation
+        self._candidate = None
+        self._candidate_count = 0
+        self._timestamp = None
+
+    @property
+    def gate(self):
+        """
+        Slice of the range bins in the gate, or None before the first update.
+
+        """
+        if self.center is None:
+            return None
+        return slice(max(0, self.center - self.half_width), min(self.n_bins, self.center + self.half_width + 1))
+
+    @property
+    def range(self):
+        """
+        Filtered target range in m.
+
+        """
+        return None if self.position is None else sample2range(self.position)
+
+    @property
+    def gate_range(self):
+        """
+        Range of the gate center in m, it only changes when the gate moves.
+
+        """
+        return None if self.center is None else sample2range(self.center)
+
+    def _jump(self, position):
+        self.position = position
+        self.velocity = 0.0
+        self.center = int(round(position))
+        self._candidate = None
+        self._candidate_count = 0
+
+    def update(self, profile, timestamp=None):
+        """
+        Updates the track with the variance profile of a new frame, 'timestamp' in s (default: one frame per s).
+
+        Returns:
+            gate: slice of the range bins around the target
+        """
+        profile = np.asarray(profile, dtype=float)
+        self.n_bins = len(profile)
+        k = int(np.argmax(profile))
+
+        dt = 1.0
+        if timestamp is not None:
+            if self._timestamp is not None and timestamp > self._timestamp:
+                dt = timestamp - self._timestamp
+            self._timestamp = timestamp
+
+        if self.position is None:
+            self._jump(peakInterpolation(profile, k))
+            return self.gate
+
+        # strongest bin inside the gate
+        gate = self.gate
+        k_gate = gate.start + int(np.argmax(profile[gate]))
+
+        # a stronger peak outside of the gate has to persist before the track jumps to it
+        if not gate.start <= k < gate.stop and profile[k] > self.hysteresis * profile[k_gate]:
+            if self._candidate is not None and abs(k - self._candidate) <= 1:
+                self._candidate_count += 1
+            else:
+                self._candidate_count = 1
+            self._candidate = k
+            if self._candidate_count >= self.confirm:
+                self._jump(peakInterpolation(profile, k))
+                return self.gate
+        else:
+            self._candidate = None
+            self._candidate_count = 0
+
+        # alpha-beta filter with the interpolated peak inside the gate
+        predicted = self.position + self.velocity * dt
+        residual = peakInterpolation(profile, k_gate) - predicted
+        self.position = predicted + self.alpha * residual
+        self.velocity += self.beta * residual / dt
+        self.position = float(np.clip(self.position, 0, self.n_bins - 1))
+
+        # move the gate only when the track leaves its center region
+        if abs(self.position - self.center) > self.half_width / 2:
+            self.center = int(round(self.position))
+
+        return self.gate
@@ -8,17 +8,271 @@ FC = 7.15e9    # carrier frequency
 B = 1.7e9      # bandwidth
 
 
-def getStack(dq):
+class RingBuffer:
     """
-    Converts a deque collection to a numpy array by stacking the elements.
-    In this use case, elements are 2D-slices (fast-time x channels). Stacking them adds the slow-time dimension.
+    Fixed-capacity buffer of equally shaped elements (e.g. 2D slices fast-time x channels) in one preallocated array.
+    Appending is O(1) and overwrites the oldest element when the buffer is full. The array is allocated on the first
+    append with the shape and dtype of that element.
+
+    With 'mirrored' every element is written twice, so view() is always a contiguous zero-copy view of the elements
+    in chronological order, at twice the memory. Without it view() copies once the buffer has wrapped around, use
+    segments() to avoid the copy.
+
+    """
+    def __init__(self, capacity, mirrored=True):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.mirrored = mirrored
+        self.data = None
+
+        # index of the next write and number of stored elements
+        self._head = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def full(self):
+        return self._len == self.capacity
+
+    def clear(self):
+        """
+        Empties the buffer, the allocated array is kept.
+
+        """
+        self._head = 0
+        self._len = 0
+
+    def fits(self, x):
+        """
+        Returns whether x can be appended without reallocating (and emptying) the buffer.
+
+        """
+        return self.data is not None and self.data.shape[1:] == x.shape and self.data.dtype == x.dtype
+
+    def _allocate(self, x):
+        size = 2 * self.capacity if self.mirrored else self.capacity
+        self.data = np.empty((size,) + x.shape, dtype=x.dtype)
+        self.clear()
+
+    def append(self, x):
+        """
+        Copies x into the buffer. The buffer is reallocated (and emptied) when the shape or dtype of x changes.
+
+        """
+        x = np.asarray(x)
+        if not self.fits(x):
+            self._allocate(x)
+
+        self.data[self._head] = x
+        if self.mirrored:
+            self.data[self._head + self.capacity] = x
+
+        self._head = (self._head + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def latest(self):
+        """
+        Returns a view of the newest element.
+
+        """
+        if not self._len:
+            raise IndexError("RingBuffer is empty")
+        return self.data[self._head - 1]
+
+    def segments(self):
+        """
+        Returns the elements in chronological order as two zero-copy views (older, newer), the first is empty until
+        the buffer has wrapped around.
+
+        """
+        if self.data is None:
+            empty = np.empty((0,))
+            return empty, empty
+        start = (self._head - self._len) % self.capacity
+        if start + self._len <= self.capacity:
+            return self.data[start:start], self.data[start:start + self._len]
+        return self.data[start:self.capacity], self.data[:self._head]
+
+    def view(self):
+        """
+        Returns the elements in chronological order (slow-time x element shape). The view is only valid until the
+        next append, copy it to keep it.
+
+        Returns:
+            signal_matrix: numpy array, a view if the buffer is mirrored or hasn't wrapped around
+        """
+        if self.mirrored and self.data is not None:
+            start = (self._head - self._len) % self.capacity
+            return self.data[start:start + self._len]
+        older, newer = self.segments()
+        return np.concatenate((older, newer)) if len(older) else newer
+
+
+def _accumulatorDtype(x):
+    """
+    Double precision dtype for the accumulators of x, real or complex like x.
+
+    """
+    return np.result_type(x.dtype, np.float64)
+
+
+class RunningMean:
+    """
+    Mean over the last 'window' elements, updated in O(element size) per element with a running sum.
+    The sum is accumulated in double precision and recomputed from the window every 'recompute_every' updates, so
+    rounding errors of frames leaving the window don't accumulate.
+    The elements are kept in 'buffer' (a RingBuffer), which can be used as the slow-time buffer itself.
+
+    """
+    def __init__(self, window, recompute_every=1000):
+        self.buffer = RingBuffer(window)
+        self.recompute_every = recompute_every
+        self._sum = None
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def clear(self):
+        self.buffer.clear()
+        self._sum = None
+        self._updates = 0
+
+    def update(self, x):
+        """
+        Adds x to the window and returns the new mean, in the dtype of x.
+
+        """
+        x = np.asarray(x)
+        if self._sum is None or not self.buffer.fits(x):
+            self.clear()
+            self._sum = np.zeros(x.shape, dtype=_accumulatorDtype(x))
+
+        if self.buffer.full:
+            self._sum -= self.buffer.view()[0]
+        self.buffer.append(x)
+        self._sum += x
+
+        self._updates += 1
+        if self._updates % self.recompute_every == 0:
+            self._sum = self.buffer.view().sum(axis=0, dtype=self._sum.dtype)
+
+        return self.mean
+
+    @property
+    def mean(self):
+        if not self.buffer:
+            return None
+        return (self._sum / len(self.buffer)).astype(self.buffer.data.dtype, copy=False)
+
+
+class RunningVariance:
+    """
+    Slow-time mean and variance (ddof=0, like np.var) over the last 'window' elements, updated in O(element size)
+    per element. While the window fills up Welford's update is used, afterwards the sliding form that replaces the
+    oldest element x_old by x_new:
+
+        mean' = mean + (x_new - x_old) / n
+        M2'   = M2 + Re((x_new - x_old) * conj(x_new - mean' + x_old - mean))
+
+    M2 is the sum of the squared deviations, variance = M2 / n. Both are accumulated in double precision and
+    recomputed from the window every 'recompute_every' updates.
+    The elements are kept in 'buffer' (a RingBuffer), which can be used as the slow-time buffer itself.
+
+    """
+    def __init__(self, window, recompute_every=1000):
+        self.buffer = RingBuffer(window)
+        self.recompute_every = recompute_every
+        self._mean = None
+        self._m2 = None
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def clear(self):
+        self.buffer.clear()
+        self._mean = None
+        self._m2 = None
+        self._updates = 0
+
+    def update(self, x):
+        """
+        Adds x to the window.
+
+        """
+        x = np.asarray(x)
+        if self._mean is None or not self.buffer.fits(x):
+            self.clear()
+            self._mean = np.zeros(x.shape, dtype=_accumulatorDtype(x))
+            self._m2 = np.zeros(x.shape)
+
+        if self.buffer.full:
+            # slide: x_new replaces the oldest element
+            n = len(self.buffer)
+            x_old = self.buffer.view()[0].astype(self._mean.dtype)
+            d = x - x_old
+            mean = self._mean + d / n
+            self._m2 += np.real(d * np.conj(x - mean + x_old - self._mean))
+            self._mean = mean
+        else:
+            # grow: Welford's update
+            n = len(self.buffer) + 1
+            delta = x - self._mean
+            self._mean += delta / n
+            self._m2 += np.real(delta * np.conj(x - self._mean))
+        self.buffer.append(x)
+
+        self._updates += 1
+        if self._updates % self.recompute_every == 0:
+            self.recompute()
+
+    def recompute(self):
+        """
+        Recomputes mean and M2 from the elements in the window.
+
+        """
+        window = self.buffer.view()
+        self._mean = window.mean(axis=0, dtype=self._mean.dtype)
+        self._m2 = np.sum(np.abs(window - self._mean) ** 2, axis=0)
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def variance(self):
+        """
+        Variance along slow-time in the real dtype of the elements, or None for less than two elements.
+
+        """
+        if len(self.buffer) < 2:
+            return None
+        dtype = np.real(self.buffer.data[:0]).dtype
+        return (np.maximum(self._m2, 0) / len(self.buffer)).astype(dtype, copy=False)
+
+
+def resampleUniform(t, x):
+    """
+    Resamples a slow-time series with jittery sample times t (s) onto a uniform grid with the same number of samples
+    and the same time span, using linear interpolation.
     
     Returns:
-        signal_matrix: 3D numpy array (slow-time x fast-time x channels)
+        t_uniform: uniform sample times
+        x_uniform: resampled series
+        fs: sampling rate of the uniform grid in Hz
     """
-    signal_matrix = np.stack(dq, axis=0)
+    N = len(t)
+    span = t[-1] - t[0]
+    fs = (N - 1) / span if span > 0 else float('nan')
+    
+    t_uniform = np.linspace(t[0], t[-1], N)
+    x_uniform = np.interp(t_uniform, t, x)
     
-    return signal_matrix
+    return t_uniform, x_uniform, fs
 
 
 def dummy_signal_generator(freq=0.1, shape=(8192, 4)):
@@ -0,0 +1,171 @@
+import cmath
+from typing import NamedTuple
+
+import numpy as np
+from scipy.constants import c
+
+from vital_radar.processing.raw_signal_processing import FC
+from vital_radar.processing.filters import StreamingSOSFilter
+from vital_radar.processing.spectrum_estimation import BREATHING_BAND, HEART_BAND, bandGrid
+from vital_radar.processing.band_spectrum import SlidingDFTBank, peakFrequency, peakConfidence
+from vital_radar.processing.utils import RingBuffer
+
+
+# constants
+WAVELENGTH = c / FC     # wavelength of the carrier in m
+
+# filter stages of the displacement per band: (order, cutoff in Hz, type)
+VITAL_BREATHING_STAGES = ((2, BREATHING_BAND, 'band'),)
+VITAL_HEART_STAGES = ((2, HEART_BAND, 'band'),)
+
+
+class VitalSigns(NamedTuple):
+    """
+    Breathing and heart rate (per minute) estimated at 'timestamp' (s), each with a confidence between 0 (a flat
+    spectrum) and 1 (a single tone in the band), see peakConfidence().
+
+    """
+    timestamp: float
+    breathing_rate: float
+    breathing_confidence: float
+    heart_rate: float
+    heart_confidence: float
+
+
+class VitalSignEstimator:
+    """
+    Streaming breathing and heart rate estimation from the complex slow-time sample of the beam at the target, one
+    sample per frame.
+
+    The phase of the sample is unwrapped incrementally, from the phase step to the previous sample, and converted to
+    the displacement of the target (lambda / (4 pi) per rad). The displacement is band-pass filtered causally for
+    each band and fed into a SlidingDFTBank on the band grid, whose window covers the last 'breathing_s' and 'heart_s'
+    seconds. The rates are the interpolated peaks of the band spectra. The windows are fixed in samples at the first
+    sampling rate, so every frame costs the same and the estimates lag the newest frame by half of their window
+    (see latency). The sampling rate is the mean rate of the last 'rate_window' timestamps. The filtered
+    displacements and their timestamps are kept for the last 'history' frames.
+
+    """
+    def __init__(self, breathing_s=20.0, heart_s=10.0, history=1500, rate_window=100):
+        self.breathing_s = breathing_s
+        self.heart_s = heart_s
+        self.breathing_grid = bandGrid(BREATHING_BAND)
+        self.heart_grid = bandGrid(HEART_BAND)
+        self.breathing_filter = StreamingSOSFilter(VITAL_BREATHING_STAGES)
+        self.heart_filter = StreamingSOSFilter(VITAL_HEART_STAGES)
+
+        # input timestamps for the sampling rate
+        self.timestamps = RingBuffer(rate_window)
+
+        # filtered displacements (m) and their timestamps
+        self.times = RingBuffer(history)
+        self.breathing = RingBuffer(history)
+        self.heart = RingBuffer(history)
+        self.reset()
+
+    def reset(self):
+        self.breathing_filter.reset()
+        self.heart_filter.reset()
+        self.breathing_bank = None
+        self.heart_bank = None
+        for buffer in (self.timestamps, self.times, self.breathing, self.heart):
+            buffer.clear()
+
+        # unwrapped phase (rad) and the last sample it refers to
+        self.phase = 0.0
+        self._last = None
+        self.estimate = None
+
+    @property
+    def fs(self):
+        """
+        Mean sampling rate (Hz) of the last timestamps, nan for less than two timestamps.
+
+        """
+        if len(self.timestamps) < 2:
+            return float('nan')
+        t = self.timestamps.view()
+        span = t[-1] - t[0]
+        return (len(t) - 1) / span if span > 0 else float('nan')
+
+    @property
+    def latency(self):
+        """
+        Delay (s) of the breathing and the heart rate estimate behind the newest frame, half of their window.
+
+        """
+        return self.breathing_s / 2, self.heart_s / 2
+
+    @property
+    def displacement(self):
+        """
+        Displacement (m) of the target along the line of sight since the first sample.
+
+        """
+        return self.phase * WAVELENGTH / (4 * np.pi)
+
+    def update(self, timestamp, sample, previous=None):
+        """
+        Adds the complex sample of the beam acquired at 'timestamp' (s). 'previous' is the sample of the frame before
+        at the same range and with the same beam weights, if the beam changed since the last sample (e.g. the range
+        gate moved), otherwise the phase step is taken to the last sample.
+
+        Returns:
+            estimate: VitalSigns or None while the windows are still filling up
+        """
+        self.timestamps.append(timestamp)
+
+        # incremental unwrap: the phase step between two frames is within -pi and pi
+        sample = complex(sample)
+        reference = self._last if previous is None else complex(previous)
+        if reference is not None:
+            self.phase += cmath.phase(sample * reference.conjugate())
+        self._last = sample
+
+        # the heart band must be below the Nyquist frequency
+        fs = self.fs
+        if not np.isfinite(fs) or fs <= 2 * HEART_BAND[1]:
+            return None
+
+        # the windows are fixed in samples at the first rate
+        if self.breathing_bank is None:
+            self.breathing_bank = SlidingDFTBank(self.breathing_grid, max(2, int(round(self.breathing_s * fs))))
+            self.heart_bank = SlidingDFTBank(self.heart_grid, max(2, int(round(self.heart_s * fs))))
+
+        d = self.displacement
+        breathing = self.breathing_filter.process(d, fs)
+        heart = self.heart_filter.process(d, fs)
+        self.breathing_bank.update(breathing, fs)
+        self.heart_bank.update(heart, fs)
+
+        self.times.append(timestamp)
+        self.breathing.append(breathing)
+        self.heart.append(heart)
+
+        P_breathing = self.breathing_bank.psd()
+        P_heart = self.heart_bank.psd()
+        if P_breathing is None or P_heart is None:
+            return None
+
+        # mainlobe of the Hann window: -+ 2 bins of the window
+        self.estimate = VitalSigns(
+            timestamp,
+            60 * float(peakFrequency(self.breathing_grid, P_breathing)),
+            peakConfidence(self.breathing_grid, P_breathing, 2 / self.breathing_s),
+            60 * float(peakFrequency(self.heart_grid, P_heart)),
+            peakConfidence(self.heart_grid, P_heart, 2 / self.heart_s),
+        )
+        return self.estimate
+
+    def spectra(self):
+        """
+        PSD of the windows on the band grids {name: (f, P)}, only the bands whose window is full.
+
+        """
+        spectra = {}
+        for name, grid, bank in (('Breathing', self.breathing_grid, self.breathing_bank),
+                                 ('Heart', self.heart_grid, self.heart_bank)):
+            P = None if bank is None else bank.psd()
+            if P is not None:
+                spectra[name] = (grid, P)
+        return spectra
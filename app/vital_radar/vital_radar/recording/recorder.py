@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import queue
+import threading
+
+import numpy as np
+
+from vital_radar.processing.raw_signal_processing import processRawSignal
+
+
+# default location of the recorded sessions
+RECORDINGS_DIR = os.path.join(os.path.expanduser("~"), "Vital Radar", "recordings")
+
+# version of the segment format
+FORMAT_VERSION = 1
+
+
+def recordDtype(dtype, shape):
+    """
+    Returns the numpy dtype of one stored frame: the timestamp followed by the signal matrix.
+
+    """
+    return np.dtype([('timestamp', '<f8'), ('signals', np.dtype(dtype), tuple(shape))])
+
+
+def segmentPaths(session_dir):
+    """
+    Returns the (data, metadata) paths of all segments of a session, oldest first.
+
+    """
+    names = sorted(f for f in os.listdir(session_dir) if f.startswith("segment_") and f.endswith(".bin"))
+    return [(os.path.join(session_dir, f), os.path.join(session_dir, f[:-4] + ".json")) for f in names]
+
+
+class Recorder:
+    """
+    Streams acquired frames to disk while the app is running.
+
+    A session is a directory of segments. Every segment is a binary file of fixed-size records (timestamp, signal
+    matrix) that can be read with np.memmap, and a JSON file with the pairs, dtype and shape of the records.
+    Frames are collected in chunks and written by a background thread, a new segment is started when the current one
+    exceeds 'segment_bytes' or the antenna pairs change. When the closed segments exceed 'max_bytes' the oldest ones
+    are deleted, so a recording can run for hours with constant memory and bounded disk usage.
+
+    'kind' is 'raw' for the RF signals or 'baseband' for the downconverted and downsampled signals.
+
+    """
+    def __init__(self, session_dir=None, kind='raw', chunk_frames=32, segment_bytes=256 * 2**20,
+                 max_bytes=8 * 2**30, max_pending=16):
+        if kind not in ('raw', 'baseband'):
+            raise ValueError(f"Unknown recording kind: {kind}")
+
+        if session_dir is None:
+            session_dir = os.path.join(RECORDINGS_DIR, time.strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(session_dir, exist_ok=True)
+
+        self.session_dir = session_dir
+        self.kind = kind
+        self.chunk_frames = chunk_frames
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+
+        # chunk that is currently filled by append()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._chunk = None
+        self._chunk_pairs = None
+        self._chunk_len = 0
+
+        # chunks waiting for the writer thread, dropped if the disk can't keep up
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+
+        # state of the writer thread
+        self._segment = None
+        self._segment_index = 0
+        self._segments = []
+        self.frames = 0
+
+        self._writer = threading.Thread(target=self._writeLoop, daemon=True)
+        self._writer.start()
+
+    def append(self, frame):
+        """
+        Adds a frame to the recording. The signals are copied, so the frame can be reused afterwards.
+
+        """
+        with self._lock:
+            if not self._closed:
+                self._append(frame)
+
+    def _append(self, frame):
+        if self._chunk is not None and frame.pairs != self._chunk_pairs:
+            self._flushChunk()
+
+        if self._chunk is None:
+            self._chunk = np.empty(self.chunk_frames, dtype=recordDtype(frame.signals.dtype, frame.signals.shape))
+            self._chunk_pairs = frame.pairs
+            self._chunk_len = 0
+
+        record = self._chunk[self._chunk_len]
+        record['timestamp'] = frame.timestamp
+        record['signals'] = frame.signals
+        self._chunk_len += 1
+
+        if self._chunk_len == self.chunk_frames:
+            self._flushChunk()
+
+    def close(self):
+        """
+        Writes the remaining frames and finalizes the current segment.
+
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flushChunk()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _flushChunk(self):
+        """
+        Hands the filled part of the current chunk to the writer thread.
+
+        """
+        if self._chunk is None or self._chunk_len == 0:
+            return
+        try:
+            self._queue.put_nowait((self._chunk_pairs, self._chunk[:self._chunk_len]))
+        except queue.Full:
+            self.dropped += self._chunk_len
+        self._chunk = None
+
+    def _writeLoop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            pairs, chunk = item
+            if self.kind == 'baseband':
+                chunk = self._toBaseband(chunk)
+            self._write(pairs, chunk)
+        self._closeSegment()
+
+    def _toBaseband(self, chunk):
+        """
+        Converts a chunk of raw records to baseband records.
+
+        """
+        signals = processRawSignal(chunk['signals'])
+        out = np.empty(len(chunk), dtype=recordDtype(signals.dtype, signals.shape[1:]))
+        out['timestamp'] = chunk['timestamp']
+        out['signals'] = signals
+        return out
+
+    def _write(self, pairs, chunk):
+        """
+        Appends a chunk to the current segment, starting a new one if necessary.
+
+        """
+        meta = {
+            'kind': self.kind,
+            'pairs': [list(p) for p in pairs],
+            'dtype': chunk.dtype['signals'].base.str,
+            'shape': list(chunk.dtype['signals'].shape),
+        }
+        if (self._segment is None or self._segment['meta'] != meta
+                or self._segment['bytes'] + chunk.nbytes > self.segment_bytes):
+            self._closeSegment()
+            self._openSegment(meta)
+
+        chunk.tofile(self._segment['file'])
+        self._segment['bytes'] += chunk.nbytes
+        self._segment['frames'] += len(chunk)
+        self.frames += len(chunk)
+
+    def _openSegment(self, meta):
+        name = f"segment_{self._segment_index:05d}"
+        self._segment_index += 1
+        data_path = os.path.join(self.session_dir, name + ".bin")
+        meta_path = os.path.join(self.session_dir, name + ".json")
+        self._segment = {
+            'meta': meta,
+            'file': open(data_path, "wb"),
+            'paths': (data_path, meta_path),
+            'bytes': 0,
+            'frames': 0,
+            'created': time.time(),
+        }
+        self._writeMeta()
+
+    def _closeSegment(self):
+        if self._segment is None:
+            return
+        self._segment['file'].close()
+        self._writeMeta()
+        self._segments.append((self._segment['paths'], self._segment['bytes']))
+        self._segment = None
+        self._enforceBudget()
+
+    def _writeMeta(self):
+        segment = self._segment
+        meta = dict(segment['meta'], version=FORMAT_VERSION, frames=segment['frames'], created=segment['created'])
+        with open(segment['paths'][1], "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def _enforceBudget(self):
+        """
+        Deletes the oldest closed segments until the session fits into max_bytes.
+
+        """
+        total = sum(size for _, size in self._segments)
+        while len(self._segments) > 1 and total > self.max_bytes:
+            (data_path, meta_path), size = self._segments.pop(0)
+            os.remove(data_path)
+            os.remove(meta_path)
+            total -= size
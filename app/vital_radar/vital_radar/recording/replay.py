@@ -0,0 +1,162 @@
+import json
+import time
+import argparse
+
+import numpy as np
+
+from vital_radar.recording.recorder import recordDtype, segmentPaths
+from vital_radar.walabot.acquisition import Frame
+from vital_radar.processing.display_modes import DisplayMode
+from vital_radar.processing.pipeline import ProcessingPipeline
+from vital_radar.processing.raw_signal_processing import processRawSignal
+
+
+class SessionReader:
+    """
+    Reads the frames of a recorded session (see Recorder) in the order they were recorded.
+    The segments are memory mapped, so sessions larger than the RAM can be read.
+
+    """
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        self.segments = []
+        for data_path, meta_path in segmentPaths(session_dir):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            records = np.memmap(data_path, dtype=recordDtype(meta['dtype'], meta['shape']), mode='r')
+            pairs = tuple(tuple(p) for p in meta['pairs'])
+            self.segments.append((meta, pairs, records))
+
+        if not self.segments:
+            raise FileNotFoundError(f"No recorded segments in {session_dir}")
+
+    def __len__(self):
+        return sum(len(records) for _, _, records in self.segments)
+
+    @property
+    def kind(self):
+        return self.segments[0][0]['kind']
+
+    @property
+    def duration(self):
+        """
+        Time between the first and the last recorded frame in seconds.
+
+        """
+        return float(self.segments[-1][2]['timestamp'][-1] - self.segments[0][2]['timestamp'][0])
+
+    def frames(self):
+        """
+        Yields all recorded frames. The signals are read-only views into the memory mapped files.
+
+        """
+        for _, pairs, records in self.segments:
+            for record in records:
+                yield Frame(float(record['timestamp']), record['signals'], pairs)
+
+    def baseband(self):
+        """
+        Yields (timestamps, signals, pairs) per segment, with the signals of all frames (slow-time x fast-time x 
+        channels) converted to baseband in one batched call. Use this to re-process whole recordings offline.
+
+        """
+        for meta, pairs, records in self.segments:
+            signals = records['signals']
+            if meta['kind'] == 'raw':
+                signals = processRawSignal(signals)
+            yield np.array(records['timestamp']), signals, pairs
+
+
+class ReplaySource:
+    """
+    Acquisition source for the AcquisitionWorker that replays a recorded session instead of triggering the radar.
+    The frames keep their recorded timestamps and antenna pairs, the selection of the GUI is ignored.
+
+    'speed' paces the replay relative to the recorded timestamps: 1.0 is real time, 2.0 twice as fast and None
+    replays as fast as possible. With 'loop' the session starts over at the end, the timestamps keep increasing.
+
+    """
+    # returns complete Frames, the AcquisitionWorker needs neither a pair selection nor a ring of signal matrices
+    complete_frames = True
+
+    def __init__(self, session_dir, speed=1.0, loop=False):
+        self.reader = SessionReader(session_dir)
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+
+        self._frames = self.reader.frames()
+        self._offset = 0.0
+        self._first = None
+        self._last = None
+        self._start = None
+
+    def _nextFrame(self):
+        frame = next(self._frames, None)
+        if frame is None and self.loop:
+            # continue the timestamps one mean frame interval after the last frame
+            interval = self.reader.duration / max(len(self.reader) - 1, 1)
+            self._offset = self._last - self._first + interval
+            self._frames = self.reader.frames()
+            frame = next(self._frames, None)
+        return frame
+
+    def __call__(self, pairs=None, out=None):
+        """
+        Returns the next recorded frame once it is due, or None at the end of the session.
+
+        """
+        frame = self._nextFrame()
+        if frame is None:
+            self.finished = True
+            return None
+
+        if self._first is None:
+            self._first = frame.timestamp
+            self._start = time.perf_counter()
+
+        timestamp = frame.timestamp + self._offset
+        self._last = timestamp
+
+        # wait until the frame is due
+        if self.speed:
+            due = self._start + (timestamp - self._first) / self.speed
+            remaining = due - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+        return Frame(timestamp, frame.signals, frame.pairs)
+
+
+def benchmarkReplay(session_dir, display_mode, plot_every=1):
+    """
+    Feeds a recorded session as fast as possible through the processing pipeline of the GUI and computes the plot
+    data every 'plot_every' frames. Use this to compare the throughput of algorithm changes on identical data.
+
+    Returns:
+        results: dictionary with the number of 'frames', the processing time in 'seconds' and 'frames_per_second'
+    """
+    reader = SessionReader(session_dir)
+    pipeline = ProcessingPipeline(display_mode)
+
+    start = time.perf_counter()
+    n = 0
+    for frame in reader.frames():
+        pipeline.push(frame)
+        n += 1
+        if n % plot_every == 0:
+            pipeline.plotData()
+    seconds = time.perf_counter() - start
+
+    return {'frames': n, 'seconds': seconds, 'frames_per_second': n / seconds if seconds > 0 else float('nan')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the processing throughput on a recorded session")
+    parser.add_argument("session_dir")
+    parser.add_argument("--mode", default="BREATHING", choices=[mode.name for mode in DisplayMode])
+    parser.add_argument("--plot-every", type=int, default=1, help="compute the plot data every n frames")
+    args = parser.parse_args()
+
+    results = benchmarkReplay(args.session_dir, DisplayMode[args.mode], args.plot_every)
+    print(f"{results['frames']} frames in {results['seconds']:.2f} s: {results['frames_per_second']:.1f} frames/s")
@@ -0,0 +1,244 @@
+import time
+import threading
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+from PyQt6.QtCore import QThread
+
+from vital_radar.processing.precision import realDtype
+
+
+class Frame(NamedTuple):
+    """
+    A single acquired frame: the raw signals (fast-time x channels) of the antenna pairs in 'pairs' (same order as the
+    columns) and the monotonic time of the trigger in seconds.
+
+    """
+    timestamp: float
+    signals: np.ndarray
+    pairs: tuple
+
+
+class TriggerRateEstimator:
+    """
+    Estimates the slow-time sampling rate of one acquisition session from the trigger timestamps.
+    The rate is computed over a sliding window of the last 'window' triggers. An interval longer than 'late_factor'
+    times the median interval counts as a late trigger, the number of missing triggers in it counts as dropped.
+
+    """
+    def __init__(self, window=100, late_factor=1.5):
+        self.late_factor = late_factor
+        self._timestamps = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.late = 0
+        self.dropped = 0
+
+    def reset(self):
+        with self._lock:
+            self._timestamps.clear()
+            self.late = 0
+            self.dropped = 0
+
+    def update(self, timestamp):
+        """
+        Adds the timestamp (seconds, monotonic) of a new trigger.
+
+        """
+        with self._lock:
+            if len(self._timestamps) >= 3:
+                dt = timestamp - self._timestamps[-1]
+                nominal = np.median(np.diff(self._timestamps))
+                if dt > self.late_factor * nominal:
+                    self.late += 1
+                    self.dropped += int(round(dt / nominal)) - 1
+            self._timestamps.append(timestamp)
+
+    @property
+    def rate(self):
+        """
+        Mean trigger rate in Hz over the window, NaN until two triggers are known.
+
+        """
+        with self._lock:
+            if len(self._timestamps) < 2:
+                return float('nan')
+            span = self._timestamps[-1] - self._timestamps[0]
+            return float((len(self._timestamps) - 1) / span) if span > 0 else float('nan')
+
+    def stats(self):
+        """
+        Returns a dictionary with the mean 'rate' (Hz), the 'jitter' (standard deviation of the trigger intervals in s)
+        and the number of 'late' and 'dropped' triggers since the last reset.
+
+        """
+        rate = self.rate
+        with self._lock:
+            dt = np.diff(self._timestamps)
+            jitter = float(np.std(dt)) if len(dt) else float('nan')
+            return {'rate': rate, 'jitter': jitter, 'late': self.late, 'dropped': self.dropped}
+
+
+class AcquisitionWorker(QThread):
+    """
+    Triggers the radar in a loop as fast as the device allows and pushes timestamped frames into a bounded buffer.
+    The GUI collects the new frames with popFrames() at its own pace. If the GUI falls behind, the oldest frames are
+    dropped and counted in 'dropped'.
+    
+    The signals are written into a preallocated ring of signal matrices, one more than the buffer holds. popFrames() 
+    takes the frames under the lock and copies their signals out of the ring after releasing it, so the worker isn't
+    blocked by the copy. Until the copies are done the slots of the popped frames are lent to popFrames() and not 
+    reused; if every slot is buffered or lent, the worker reuses the slot of the oldest buffered frame, which counts 
+    as dropped. The buffer holds at most buffer_size frames and at most max_buffer_bytes of signals, e.g. 25 frames 
+    with 40 pairs in double precision.
+    Sources with a true 'complete_frames' attribute (e.g. ReplaySource) return complete Frames with their own pairs 
+    and signals: they run without a pair selection and without the ring.
+
+    """
+    def __init__(self, source, buffer_size=64, period=0.0, n_samples=8192, max_buffer_bytes=64 * 2**20, parent=None):
+        super().__init__(parent)
+        # callable(pairs, out) writing the signal matrix (fast-time x channels) into out, 
+        # returns (timestamp, signals), a Frame or None
+        self.source = source
+        self.complete_frames = getattr(source, 'complete_frames', False)
+        self.n_samples = n_samples
+        self.buffer_size = buffer_size
+        self.max_buffer_bytes = max_buffer_bytes
+
+        # minimum time between two triggers in seconds (0 = as fast as the source allows)
+        self.period = period
+
+        # buffered (frame, ring, slot): the ring the signals were written to and its slot index, None for sources 
+        # with complete frames
+        self._frames = deque()
+        self._capacity = buffer_size
+        self._slots = None
+        self._free = deque()
+        self._lock = threading.Lock()
+        self._pairs = ()
+        
+        # set before the thread starts, so stop() also works if run() hasn't started yet
+        self._running = True
+        self._recorder = None
+        self.dropped = 0
+        
+        # slow-time rate of this session
+        self.rate = TriggerRateEstimator()
+
+    def setPairs(self, pairs):
+        """
+        Sets the antenna pairs that are acquired from the next trigger on.
+
+        """
+        with self._lock:
+            self._pairs = tuple(sorted(pairs))
+
+    def setRecorder(self, recorder):
+        """
+        Sets a recorder that receives every acquired frame, None stops recording.
+
+        """
+        with self._lock:
+            self._recorder = recorder
+
+    def popFrames(self):
+        """
+        Returns all frames acquired since the last call (oldest first) and empties the buffer. The signals are copies,
+        so the frames stay valid while the acquisition goes on.
+
+        """
+        with self._lock:
+            entries = list(self._frames)
+            self._frames.clear()
+
+        # copy without blocking the worker, the slots are only handed back afterwards
+        frames = [frame if slot is None else frame._replace(signals=frame.signals.copy()) 
+                  for frame, _, slot in entries]
+        with self._lock:
+            for entry in entries:
+                self._release(entry)
+        return frames
+
+    def stop(self):
+        """
+        Ends the acquisition loop and waits for the thread to finish.
+
+        """
+        self._running = False
+        self.wait()
+
+    def _release(self, entry):
+        """
+        Hands the slot of a buffered entry back to the ring, unless the ring was reallocated since. Call with the lock.
+
+        """
+        _, ring, slot = entry
+        if slot is not None and ring is self._slots:
+            self._free.append(slot)
+
+    def _nextSlot(self, pairs):
+        """
+        Returns the ring, the index and the signal matrix of a free slot, the ring is reallocated when the number of 
+        pairs changes.
+
+        """
+        with self._lock:
+            if self._slots is None or self._slots.shape[2] != len(pairs):
+                # as many frames as fit into the memory budget, frames still buffered keep their old ring alive
+                dtype = realDtype()
+                frame_bytes = self.n_samples * len(pairs) * np.dtype(dtype).itemsize
+                self._capacity = max(1, min(self.buffer_size, self.max_buffer_bytes // frame_bytes))
+                while len(self._frames) > self._capacity:
+                    self._frames.popleft()
+                    self.dropped += 1
+                self._slots = np.empty((self._capacity + 1, self.n_samples, len(pairs)), dtype=dtype)
+                self._free = deque(range(self._capacity + 1))
+
+            # at most capacity slots are lent, so one is free or buffered
+            while not self._free:
+                self._release(self._frames.popleft())
+                self.dropped += 1
+            slot = self._free.popleft()
+            return self._slots, slot, self._slots[slot]
+
+    def run(self):
+        while self._running:
+            with self._lock:
+                pairs = self._pairs
+
+            start = time.perf_counter()
+            if self.complete_frames:
+                ring = slot = None
+                frame = self.source(pairs, None)
+            elif not pairs:
+                # nothing to acquire, avoid busy waiting
+                self.msleep(10)
+                continue
+            else:
+                ring, slot, out = self._nextSlot(pairs)
+                frame = self.source(pairs, out)
+
+            if frame is None:
+                # radar error or end of a replay, don't retry immediately
+                with self._lock:
+                    self._release((None, ring, slot))
+                self.msleep(10)
+            else:
+                # sources that provide their own pairs (replay) return a complete Frame
+                if not isinstance(frame, Frame):
+                    frame = Frame(*frame, pairs)
+                self.rate.update(frame.timestamp)
+                with self._lock:
+                    if len(self._frames) >= self._capacity:
+                        self._release(self._frames.popleft())
+                        self.dropped += 1
+                    self._frames.append((frame, ring, slot))
+                    recorder = self._recorder
+                    
+                if recorder is not None:
+                    recorder.append(frame)
+
+            # throttle sources that are not paced by a device
+            remaining = self.period - (time.perf_counter() - start)
+            if remaining > 0:
+                time.sleep(remaining)
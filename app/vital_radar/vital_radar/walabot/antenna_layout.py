@@ -1,15 +1,73 @@
 import numpy as np
 
 
+# maximum number of pair selections kept in the position cache
+CACHE_SIZE = 64
+
+
 class AntennaLayout:
     """
     Represents the 3D coordinates of Tx and Rx antennas.
+    The positions are also kept as dense arrays with an antenna id -> row mapping, so the positions of a pair 
+    selection are looked up vectorized. The results are cached per selection.
 
     """
     def __init__(self, tx_positions, rx_positions):
         # Expect dicts mapping 1-based antenna IDs to 3-element tuples or arrays
         self.tx_positions = {i: np.asarray(pos) for i, pos in tx_positions.items()}
         self.rx_positions = {i: np.asarray(pos) for i, pos in rx_positions.items()}
+        
+        # (n, 3) position arrays and id -> row maps, -1 for ids that are not in the layout
+        self.tx_array, self.tx_rows = self._compile(self.tx_positions)
+        self.rx_array, self.rx_rows = self._compile(self.rx_positions)
+        
+        # positions per pair selection
+        self._cache = {}
+
+    @staticmethod
+    def _compile(positions):
+        ids = sorted(positions)
+        array = np.array([positions[i] for i in ids], dtype=float).reshape(-1, 3)
+        rows = np.full(max(ids, default=0) + 1, -1, dtype=np.intp)
+        rows[ids] = np.arange(len(ids))
+        return array, rows
+
+    @staticmethod
+    def _lookup(rows, ids, kind):
+        ids = np.asarray(ids, dtype=np.intp)
+        found = (ids >= 0) & (ids < len(rows))
+        index = np.where(found, rows[np.where(found, ids, 0)], -1)
+        if np.any(index < 0):
+            raise KeyError(f"{kind} antenna {ids[np.argmax(index < 0)]} not found in layout")
+        return index
+
+    def pair_indices(self, pair_list):
+        """
+        Return the rows of the Tx and Rx antennas of the pairs in tx_array and rx_array.
+        
+        """
+        pairs = np.asarray(pair_list, dtype=np.intp).reshape(-1, 2)
+        return self._lookup(self.tx_rows, pairs[:, 0], "Tx"), self._lookup(self.rx_rows, pairs[:, 1], "Rx")
+
+    def _positions(self, pair_list):
+        """
+        Cached (virtual, tx, rx) positions of the pairs, each (n_pairs, 3) and read-only.
+        
+        """
+        key = tuple(map(tuple, pair_list))
+        positions = self._cache.get(key)
+        if positions is None:
+            tx_index, rx_index = self.pair_indices(key)
+            tx = self.tx_array[tx_index]
+            rx = self.rx_array[rx_index]
+            # Virtual channel at midpoint
+            virtual = (tx + rx) / 2
+            for array in (virtual, tx, rx):
+                array.setflags(write=False)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            positions = self._cache[key] = (virtual, tx, rx)
+        return positions
 
     def get_channel_positions(self, pair_list):
         """
@@ -17,26 +75,18 @@ class AntennaLayout:
         
         """
         if pair_list:
-            positions = []
-
-            for tx, rx in pair_list:
-                tx_pos = self.tx_positions.get(tx)
-                if tx_pos is None:
-                    raise KeyError(f"Tx antenna {tx} not found in layout")
-
-                rx_pos = self.rx_positions.get(rx)
-                if rx_pos is None:
-                    raise KeyError(f"Rx antenna {rx} not found in layout")
-
-                # Virtual channel at midpoint
-                virt_pos = (tx_pos + rx_pos) / 2
-                positions.append(virt_pos)
-
-            positions = np.vstack(positions)
-            return positions, list(pair_list)
+            return self._positions(pair_list)[0], list(pair_list)
         else:
             return None
 
+    def get_bistatic_positions(self, pair_list):
+        """
+        Return the Tx and Rx positions of the specified tx/rx pairs, each (n_pairs, 3), for bistatic delays.
+        
+        """
+        _, tx, rx = self._positions(pair_list)
+        return tx, rx
+
 
 # define antenna grid 
 # coordinates are (x, y, z) in meters
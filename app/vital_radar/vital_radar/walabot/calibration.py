@@ -1,12 +1,15 @@
 from PyQt6.QtCore import QThread
-import WalabotAPI as wlbt
+
+from vital_radar.walabot.device import getDevice
 
 
 class CalibrationWorker(QThread):
     def run(self):
+        wlbt = getDevice()
         wlbt.StartCalibration()
         stat, prog = wlbt.GetStatus()
-        while stat == wlbt.STATUS_CALIBRATING and prog < 100:
+        # requestInterruption() ends the calibration early, e.g. when the app is closed
+        while stat == wlbt.STATUS_CALIBRATING and prog < 100 and not self.isInterruptionRequested():
             wlbt.Trigger()
             stat, prog = wlbt.GetStatus()
             print(f"Calibrating {prog}%")
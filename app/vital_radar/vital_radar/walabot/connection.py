@@ -1,4 +1,4 @@
-import WalabotAPI as wlbt
+from vital_radar.walabot.device import getDevice
 
 
 def initRadar():
@@ -6,6 +6,7 @@ def initRadar():
     Initialize and start Walabot. 
     Raises an exception if anything fails.
     """
+    wlbt = getDevice()
     wlbt.Init()
     wlbt.Initialize()
     wlbt.ConnectAny()
@@ -18,15 +19,19 @@ def initRadar():
 def stopRadar():
     """
     Stop and disconnect from Walabot. If something
-    is already stopped, it will just pass.
+    is already stopped (or the Walabot API is not
+    installed), it will just pass.
     """
+    wlbt = None
     try:
+        wlbt = getDevice()
         wlbt.Stop()
         wlbt.Disconnect()
     except Exception:
         pass
     finally:
-        wlbt.Clean()
+        if wlbt is not None:
+            wlbt.Clean()
     return True
 
 
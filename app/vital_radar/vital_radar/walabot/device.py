@@ -0,0 +1,42 @@
+import importlib
+
+
+# device backend used by all modules in vital_radar.walabot
+_device = None
+
+
+def setDevice(device):
+    """
+    Sets the object that implements the Walabot API calls, e.g. the WalabotAPI module or a SimulatedWalabot.
+
+    """
+    global _device
+    _device = device
+
+
+def useWalabot():
+    """
+    Uses the physical Walabot through the WalabotAPI module.
+
+    """
+    setDevice(importlib.import_module("WalabotAPI"))
+
+
+def useSimulator(**kwargs):
+    """
+    Uses a simulated Walabot, keyword arguments are passed to SimulatedWalabot.
+
+    """
+    from vital_radar.walabot.simulator import SimulatedWalabot
+    setDevice(SimulatedWalabot(**kwargs))
+
+
+def getDevice():
+    """
+    Returns the current device backend. Defaults to the physical Walabot, so WalabotAPI is only imported when a
+    device is actually used.
+
+    """
+    if _device is None:
+        useWalabot()
+    return _device
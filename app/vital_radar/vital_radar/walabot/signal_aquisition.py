@@ -1,78 +1,103 @@
 import time
 
 import numpy as np
-import WalabotAPI as wlbt
 
+from vital_radar.walabot.device import getDevice
+from vital_radar.processing.precision import realDtype
 
-trigger_freq = float('nan')
 
+N_SAMPLES = 8192    # fast-time samples per signal
 
-def updateTriggerFreq(alpha=0.1, _state={'last': None, 'ema_dt': None}):
-    """
-    Memory for 1) latest trigger time and 2) Exponential Moving Average (EMA) of time difference between triggers. 
-    Updates module level state 'trigger_freq' with the EMA trigger‐frequency in Hz if called once per 'wlbt.Trigger()'.
+
+class SignalReader:
     """
-    global trigger_freq
-    
-    # get current time
-    now = time.perf_counter()
+    Reads the signals of a selection of TX/RX antenna pairs from the Walabot.
+    The (tx, rx) -> antenna pair mapping is resolved once per selection and the signals are written directly into a 
+    preallocated signal matrix. Create a new reader for every connection, because the pair objects belong to it.
     
-    # temp variable for last time
-    last = _state['last']
-    
-    if last is not None:
-        # time difference between 2 Triggers
-        dt = now - last
+    """
+    def __init__(self):
+        self.device = getDevice()
+        self.pairs_list = None
+        self._pairs = None
+        self.buffer = None
         
-        # temp variable for current average time difference
-        ema_dt = _state['ema_dt']
+        # monotonic time of the last trigger in seconds
+        self.timestamp = float('nan')
         
-        # add current time to moving average
-        _state['ema_dt'] = dt if ema_dt is None else alpha*dt + (1-alpha)*ema_dt
-    
-    # current time is now last time
-    _state['last'] = now
+    def setPairs(self, pairs_list):
+        """
+        Sets the selected antenna pairs. The pair objects are resolved on the next read.
+        
+        """
+        self.pairs_list = tuple(pairs_list)
+        self._pairs = None
+        
+    def _resolvePairs(self):
+        """
+        Looks up the Walabot pair objects of the selected pairs once and allocates the signal matrix.
+        Pairs that are not available on the device are skipped.
+        
+        """
+        lookup = {(p.txAntenna, p.rxAntenna): p for p in self.device.GetAntennaPairs()}
+        self._pairs = [lookup[pair] for pair in self.pairs_list if pair in lookup]
+        self.buffer = np.empty((N_SAMPLES, len(self._pairs)), dtype=realDtype())
+        
+    def read(self, pairs_list, out=None):
+        """
+        Triggers the radar and writes the signals of the given pairs into 'out' or into the reusable buffer of the
+        reader, which is overwritten on the next read.
 
-    # compute frequency as reciprocal of time difference
-    avg = _state['ema_dt']
-    
-    # update trigger frequency
-    trigger_freq = (1.0/avg) if (avg is not None and avg > 0) else float('nan')
+        Returns:
+            signals: 2D numpy array (fast-time x channels) or None if radar error.
+        """
+        if self.pairs_list != tuple(pairs_list):
+            self.setPairs(pairs_list)
+            
+        try:
+            self.device.Trigger()
+            self.timestamp = time.perf_counter()
+            
+            if self._pairs is None:
+                self._resolvePairs()
+                
+            if not self._pairs:
+                return None
+            
+            signals = self.buffer if out is None else out[:, :len(self._pairs)]
+            
+            for i, pair in enumerate(self._pairs):
+                sig, _ = self.device.GetSignal(pair)
+                signals[:, i] = sig
+                
+            return signals
+        
+        except Exception as e:
+            print("", e)
+            return None
+        
+    def acquire(self, pairs_list, out=None):
+        """
+        Same as read(), but returns the frame as (timestamp, signals) or None if radar error.
+        
+        """
+        signals = self.read(pairs_list, out)
+        return None if signals is None else (self.timestamp, signals)
 
 
-def getSignals(pairs_list):
+# reader used by getSignals(), created on first use
+_reader = None
+
+
+def getSignals(pairs_list, out=None):
     """
     Triggers the radar and retrieves signal matrix for given TX/RX antenna combinations.
+    Without 'out' the returned matrix is reused by the next call, copy it to keep it.
 
     Returns:
         signals: 2D numpy array (fast-time x channels) or None if radar error.
     """
-    try:
-        wlbt.Trigger()
-        
-        # update trigger fequency
-        updateTriggerFreq()
-        
-        pairs = wlbt.GetAntennaPairs()
-        signals = None
-
-        for tx, rx in pairs_list:
-            pair = next(
-                (p for p in pairs
-                 if p.txAntenna == tx and p.rxAntenna == rx),
-                None
-            )
-            if pair is None:
-                continue
-
-            sig, _ = wlbt.GetSignal(pair)
-            sig = np.array(sig)             
-            col = sig[:, np.newaxis]        
-            signals = col if signals is None else np.concatenate((signals, col), axis=1)
-
-        return signals
-    
-    except Exception as e:
-        print("", e)
-        return None
-    
\ No newline at end of file
+    global _reader
+    if _reader is None:
+        _reader = SignalReader()
+    return _reader.read(pairs_list, out)
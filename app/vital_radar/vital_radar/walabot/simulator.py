@@ -0,0 +1,198 @@
+import time
+
+import numpy as np
+from scipy.constants import c
+
+from vital_radar.processing.raw_signal_processing import FS, FC, B
+from vital_radar.walabot.antenna_layout import antenna_layout
+
+
+# constants
+N_SAMPLES = 8192    # fast-time samples per signal
+
+
+class AntennaPair:
+    """
+    Stand-in for the antenna pair objects returned by WalabotAPI.GetAntennaPairs().
+
+    """
+    def __init__(self, txAntenna, rxAntenna):
+        self.txAntenna = txAntenna
+        self.rxAntenna = rxAntenna
+
+    def __repr__(self):
+        return f"AntennaPair({self.txAntenna}, {self.rxAntenna})"
+
+
+class Reflector:
+    """
+    A point reflector at 'position' (x, y, z in meters). It moves along the line of sight to the radar origin by the
+    sum of a breathing and a heartbeat sinusoid (rates in Hz, amplitudes in meters).
+
+    """
+    def __init__(self, position, amplitude=1.0, breathing_rate=0.0, breathing_amplitude=0.0,
+                 heart_rate=0.0, heart_amplitude=0.0):
+        self.position = np.asarray(position, dtype=float)
+        self.amplitude = amplitude
+        self.breathing_rate = breathing_rate
+        self.breathing_amplitude = breathing_amplitude
+        self.heart_rate = heart_rate
+        self.heart_amplitude = heart_amplitude
+
+    def positionAt(self, t):
+        """
+        Returns the position at time t (s).
+
+        """
+        displacement = (self.breathing_amplitude * np.sin(2 * np.pi * self.breathing_rate * t)
+                        + self.heart_amplitude * np.sin(2 * np.pi * self.heart_rate * t))
+        direction = self.position / np.linalg.norm(self.position)
+        return self.position + displacement * direction
+
+
+def chestScene(distance=1.0, breathing_rate=0.25, heart_rate=1.2):
+    """
+    Returns a person breathing in front of the radar at the given distance (m) and a static wall behind them.
+
+    """
+    chest = Reflector((0.0, 0.0, distance), amplitude=1.0,
+                      breathing_rate=breathing_rate, breathing_amplitude=5e-3,
+                      heart_rate=heart_rate, heart_amplitude=0.3e-3)
+    wall = Reflector((0.0, 0.0, distance + 1.5), amplitude=3.0)
+    return [chest, wall]
+
+
+class SimulatedWalabot:
+    """
+    Simulates the part of the WalabotAPI used by this app, so the processing can run and be timed without a device.
+    Every trigger produces 8192 RF samples at 102.4 GS/s per antenna pair: a Gaussian pulse at the carrier frequency
+    for each reflector, delayed by the Tx -> reflector -> Rx path, plus white noise.
+    Trigger() blocks to keep 'trigger_rate' (Hz), None triggers as fast as possible.
+    'clock' returns the time of the scene in seconds, e.g. a simulated clock to generate a session faster than real
+    time (with trigger_rate None).
+
+    """
+    # constants of the WalabotAPI used by this app
+    PROF_SENSOR = 'PROF_SENSOR'
+    FILTER_TYPE_NONE = 'FILTER_TYPE_NONE'
+    STATUS_DISCONNECTED = 0
+    STATUS_CONNECTED = 1
+    STATUS_IDLE = 2
+    STATUS_SCANNING = 3
+    STATUS_CALIBRATING = 4
+
+    def __init__(self, reflectors=None, trigger_rate=50.0, noise=1e-3, calibration_triggers=20,
+                 layout=antenna_layout, seed=None, clock=time.perf_counter):
+        self.reflectors = chestScene() if reflectors is None else reflectors
+        self.trigger_rate = trigger_rate
+        self.noise = noise
+        self.calibration_triggers = calibration_triggers
+        self.layout = layout
+        self.rng = np.random.default_rng(seed)
+        self.clock = clock
+
+        # fast-time axis of every signal
+        self.fast_time = np.arange(N_SAMPLES) / FS
+
+        # pulse width matching the radar bandwidth
+        self.sigma = 2 / (np.pi * B)
+
+        self.pairs = [AntennaPair(tx, rx) for tx in layout.tx_positions for rx in layout.rx_positions if tx != rx]
+        self.status = self.STATUS_DISCONNECTED
+        self._calibration = None
+        self._start = self.clock()
+        self._next_trigger = None
+        self._positions = None
+
+    def Init(self, *args):
+        pass
+
+    def Initialize(self, *args):
+        pass
+
+    def ConnectAny(self):
+        self.status = self.STATUS_CONNECTED
+
+    def SetProfile(self, profile):
+        pass
+
+    def SetDynamicImageFilter(self, filter_type):
+        pass
+
+    def Start(self):
+        self.status = self.STATUS_IDLE
+        self._start = self.clock()
+        self._next_trigger = None
+
+    def Stop(self):
+        self.status = self.STATUS_CONNECTED
+
+    def Disconnect(self):
+        self.status = self.STATUS_DISCONNECTED
+
+    def Clean(self):
+        pass
+
+    def StartCalibration(self):
+        self.status = self.STATUS_CALIBRATING
+        self._calibration = 0
+
+    def GetStatus(self):
+        """
+        Returns (status, calibration progress in percent).
+
+        """
+        if self._calibration is None:
+            return self.status, 0
+        return self.status, 100 * self._calibration / self.calibration_triggers
+
+    def GetAntennaPairs(self):
+        return self.pairs
+
+    def Trigger(self):
+        """
+        Waits for the next trigger slot and freezes the scene at the current time.
+
+        """
+        now = self.clock()
+        if self.trigger_rate:
+            if self._next_trigger is not None and self._next_trigger > now:
+                time.sleep(self._next_trigger - now)
+                now = self.clock()
+            if self._next_trigger is None:
+                self._next_trigger = now
+            self._next_trigger = max(self._next_trigger + 1 / self.trigger_rate, now)
+
+        if self._calibration is not None:
+            self._calibration += 1
+            if self._calibration >= self.calibration_triggers:
+                self._calibration = None
+                self.status = self.STATUS_IDLE
+
+        t = now - self._start
+        self._positions = np.array([r.positionAt(t) for r in self.reflectors])
+        self._amplitudes = np.array([r.amplitude for r in self.reflectors])
+
+    def GetSignal(self, pair):
+        """
+        Returns (signal, fast-time axis) of the antenna pair for the last trigger.
+
+        """
+        if self._positions is None:
+            raise RuntimeError("Trigger() must be called before GetSignal()")
+
+        tx = self.layout.tx_positions[pair.txAntenna]
+        rx = self.layout.rx_positions[pair.rxAntenna]
+
+        # Tx -> reflector -> Rx path lengths and delays, shape (reflectors,)
+        d_tx = np.linalg.norm(self._positions - tx, axis=1)
+        d_rx = np.linalg.norm(self._positions - rx, axis=1)
+        delays = (d_tx + d_rx) / c
+        gains = self._amplitudes / (d_tx * d_rx)
+
+        # Gaussian pulses at the carrier frequency, shape (fast-time, reflectors)
+        dt = self.fast_time[:, None] - delays[None, :]
+        pulses = np.exp(-0.5 * (dt / self.sigma) ** 2) * np.cos(2 * np.pi * FC * dt)
+
+        signal = pulses @ gains + self.rng.normal(scale=self.noise, size=N_SAMPLES)
+        return signal, self.fast_time
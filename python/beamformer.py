@@ -16,37 +16,53 @@ class DelaySumBeamformer:
         # Precompute angular frequencies
         self.omega = 2 * np.pi * self.freqs           
 
-    def _compute_delays(self, target_point):
+    def _compute_delays(self, target_points):
         """
-        Compute one-way delays from each element to the target and back
+        Compute one-way delays from each element to the targets and back
         
         """
-        # distances: shape (L,)
-        d = np.linalg.norm(self.positions - target_point[None, :], axis=1)
+        # distances: shape (L,) for one point (3,), (P, L) for points (P, 3)
+        d = np.linalg.norm(self.positions - target_points[..., None, :], axis=-1)
         return 2 * d / c  
 
     def _compute_weights(self, delays):
         """
-        Steering weights per element and frequency
+        Steering weights per element and frequency, shape (L, F) or (P, L, F)
 
         """
-        return np.exp(-1j * np.outer(delays, self.omega)) 
+        return np.exp(-1j * delays[..., None] * self.omega)
 
-    def beamform(self, signal_matrix, target_point):
+    def steering(self, target_points, dtype=np.complex128):
         """
-        Apply delay-and-sum beamformer to a signal matrix
+        Steering tensor of the target points (P, 3), shape (P, L, F)
 
         """
-        # Compute delays and weights
-        delays = self._compute_delays(target_point)      
-        w = self._compute_weights(delays)    
-                     
-        # Transpose
-        w_fl = w.T     
-                                       
-        # Multiply weights and sum across channels
-        weighted = signal_matrix * w_fl[None, :, :]      
+        delays = self._compute_delays(np.atleast_2d(np.asarray(target_points, dtype=float)))
+        return self._compute_weights(delays).astype(dtype, copy=False)
+
+    def beamform(self, signal_matrix, target_points, sum_beams=False):
+        """
+        Apply delay-and-sum beamformer to a signal matrix.
+        The weights are computed in double precision and applied in the precision of the signal matrix.
         
-        # Sum over channel axis
-        return np.sum(weighted, axis=2)                 
-  
\ No newline at end of file
+        For a single point (3,) the beam has shape (slow-time, fast-time). For points (P, 3) all beams are computed
+        with one contraction over the channels, shape (P, slow-time, fast-time). With 'sum_beams' the sum of the beams 
+        is returned, which equals a single beam with the summed weights and costs the same.
+
+        """
+        points = np.asarray(target_points, dtype=float)
+        w = self.steering(points, np.result_type(signal_matrix.dtype, np.complex64))
+        
+        if points.ndim == 1 or sum_beams:
+            # Transpose summed weights to (F, L)
+            w_fl = w.sum(axis=0).T
+                                           
+            # Multiply weights and sum across channels
+            weighted = signal_matrix * w_fl[None, :, :]      
+            
+            # Sum over channel axis
+            return np.sum(weighted, axis=2)
+        
+        # all beams: sum over channels of signal (S, F, L) times weights (P, L, F)
+        return np.einsum('sfl,plf->psf', signal_matrix, w, optimize=True)
+
@@ -1,3 +1,5 @@
+import time
+
 import WalabotAPI as wlbt
 import numpy as np
 import pandas as pd
@@ -43,23 +45,30 @@ def stop_walabot():
 def measure(t=30):
     selected_pairs = [(1,2), (1,6), (1,10), (1,14)]
     
-    n = np.arange(20)
-    for i in n:
+    # estimate the trigger rate from the timestamps of a few warm-up triggers
+    warmup = np.zeros(20)
+    for i in range(len(warmup)):
         signals = sa.getSignals(selected_pairs)
+        warmup[i] = time.perf_counter()
         
-    fs = sa.trigger_freq
+    fs = (len(warmup) - 1) / (warmup[-1] - warmup[0])
     M = int(np.ceil(t * fs))
     signal_buffer = np.zeros((M, 137, len(selected_pairs)))
+    timestamps = np.zeros(M)
     
     m = np.arange(M)
     for i in m:
         signals = sa.getSignals(selected_pairs)
+        timestamps[i] = time.perf_counter()
         signals = processRawSignal(signals)
         signal_buffer[i, :, :] = signals
         print(i)
-    print(sa.trigger_freq)
         
-    return signal_buffer, sa.trigger_freq
+    # mean slow-time rate of this measurement
+    fs = (M - 1) / (timestamps[-1] - timestamps[0])
+    print(fs)
+        
+    return signal_buffer, fs
 
 
 if __name__ == "__main__":
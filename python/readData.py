@@ -7,7 +7,7 @@ from scipy.constants import c
 from antenna_layout import antenna_layout
 from beamformer import DelaySumBeamformer
 from distance_estimation import slowVar, distance
-from spectrum_estimation import getWelch, bandpassFilter
+from spectrum_estimation import getWelch, bandpassFilter, zoomWelch
 from utils import moving_average
 
 
@@ -85,10 +85,8 @@ def processData(signal_matrix, points):
     # beamformer given these positions and frequencies
     bf = DelaySumBeamformer(pos, freqs)
 
-    B = np.zeros((points.shape[0], signal_matrix.shape[0], signal_matrix.shape[1]))
-    # Beamform over all points:
-    for i, r in enumerate(points):
-        B[i, :] = np.array(np.abs(bf.beamform(signal_matrix, r)))
+    # Beamform over all points at once: (points, slow-time, fast-time)
+    B = np.abs(bf.beamform(signal_matrix, points))
     
     # sum beams
     B_sum = B.sum(axis=0)  
@@ -109,13 +107,8 @@ def processData2(signal_matrix, points):
     # beamformer given these positions and frequencies
     bf = DelaySumBeamformer(pos, freqs)
 
-    B = np.zeros((points.shape[0], signal_matrix.shape[0], signal_matrix.shape[1]), dtype=np.complex64)
-    # Beamform over all points:
-    for i, r in enumerate(points):
-        B[i, :] = np.array(bf.beamform(signal_matrix, r))
-        
-    # sum beams
-    B_sum = B.sum(axis=0)  
+    # Beamform over all points and sum beams
+    B_sum = bf.beamform(signal_matrix, points, sum_beams=True)
     
     return B_sum.sum(axis=1)
 
@@ -362,9 +355,9 @@ def analyze_vitals(dx, fs, plot=False):
     dx_breathing = bandpass(dx, breathing_band)
     dx_heart = bandpass(dx, heart_band)
     
-    # Compute PSD using Welch's method
-    f_breath, Pxx_breath = signal.welch(dx_breathing, fs, nperseg=fs*4)
-    f_heart, Pxx_heart = signal.welch(dx_heart, fs, nperseg=fs*4)
+    # Compute PSD using Welch's method, only on a fine grid inside the bands
+    f_breath, Pxx_breath = zoomWelch(dx_breathing, fs, breathing_band, nperseg=fs*4)
+    f_heart, Pxx_heart = zoomWelch(dx_heart, fs, heart_band, nperseg=fs*4)
     
     # Find peak in each band
     idx_breath = np.argmax(Pxx_breath)
@@ -1,5 +1,6 @@
 import numpy as np
-from scipy.signal import butter, filtfilt, welch, freqz
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import butter, filtfilt, welch, freqz, get_window, ZoomFFT
 from statsmodels.regression.linear_model import yule_walker
 
 
@@ -21,6 +22,29 @@ def getWelch(x, fs, nfft=2048):
     return f, P
 
 
+def zoomWelch(x, fs, band, resolution=0.005, nperseg=None, noverlap=None):
+    """
+    Welch PSD of x (Hann window, constant detrend, density scaling like welch()) evaluated only on a grid inside 
+    'band' (Hz) with the given resolution (Hz), with a zoom FFT (chirp z-transform) per segment.
+    'nperseg' defaults to the whole signal, 'noverlap' to half a segment.
+    
+    """
+    x = np.asarray(x, dtype=float)
+    nperseg = len(x) if nperseg is None else min(int(nperseg), len(x))
+    noverlap = nperseg // 2 if noverlap is None else noverlap
+    
+    low, high = band
+    f = np.linspace(low, high, int(round((high - low) / resolution)) + 1)
+    window = get_window('hann', nperseg)
+    segments = sliding_window_view(x, nperseg)[::nperseg - noverlap]
+    segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+    
+    transform = ZoomFFT(nperseg, [f[0], f[-1]], m=len(f), fs=fs, endpoint=True)
+    X = transform(segments, axis=-1)
+    P = 2 * np.mean(X.real ** 2 + X.imag ** 2, axis=0) / (fs * np.sum(window ** 2))
+    return f, P
+
+
 def getARpsd(x, fs, order=8, nfft=512):
     """
     Estimate the PSD of x using an AR fit of given order.
@@ -6,40 +6,41 @@ import matplotlib.pyplot as plt
 # ----------------------------------------------
 def downsample(x_fast, Fs, Fc, B):
     """
-    Converts a fast‐time signal x_fast (1D array, length N) to baseband,
+    Converts a fast‐time signal x_fast (length N along the last axis) to baseband,
     truncates to bandwidth B, then iDFT’s back. Matches the MATLAB logic:
       y = downsample(x, Fs, Fc, B)
     where:
-      - x_fast:  length‐N complex or real waveform (fast time)
+      - x_fast:  length‐N complex or real waveform (fast time), or a block of
+                 waveforms (..., N), e.g. all slow‐time frames (N_slow_time, N)
       - Fs:      fast‐time sampling frequency (e.g. 102.4e9)
       - Fc:      carrier frequency (e.g. 7.15e9)
       - B:       radar bandwidth (e.g. 1.7e9)
     Returns
-      y_bb_ds:  length (M+1) complex waveform, where M = int(N * B/Fs)
+      y_bb_ds:  length (M+1) complex waveform(s) along the last axis, where M = int(N * B/Fs)
     """
-    N = x_fast.shape[0]
+    N = x_fast.shape[-1]
     n = np.arange(N)
 
     # 1) Downconvert to baseband
     x_bb = x_fast * np.exp(-1j * 2 * np.pi * Fc * n / Fs)
 
     # 2) DFT of baseband signal
-    Xbb = np.fft.fft(x_bb)
+    Xbb = np.fft.fft(x_bb, axis=-1)
 
     # 3) Determine number of samples in radar‐bandwidth
     M = int(np.round(N * B / Fs))  # → matches MATLAB: N * B/Fs exactly
     half_M = M // 2
 
     # 4) Truncate in frequency by centering and selecting M+1 bins
-    Xbb_shifted = np.fft.fftshift(Xbb)
+    Xbb_shifted = np.fft.fftshift(Xbb, axes=-1)
     center = N // 2
     start = center - half_M
     end = center + half_M + 1   # end is exclusive in Python slicing → yields M+1 points
 
-    Y = Xbb_shifted[start:end]  # length = M+1
+    Y = Xbb_shifted[..., start:end]  # length = M+1
 
     # 6) iDFT and normalize
-    y_bb_ds = np.fft.ifft(Y) * (M + 1) / N
+    y_bb_ds = np.fft.ifft(Y, axis=-1) * (M + 1) / N
 
     return y_bb_ds
 
@@ -164,12 +165,9 @@ if __name__ == "__main__":
   # We already have sig_pair of shape (N_slow_time, N_fast_time).
   N_slow_time, N_ft = sig_pair.shape
   M = int(np.round(N_ft * B / Fs))    # M=136
-  y = np.zeros((M + 1, N_slow_time), dtype=complex)
 
-  # Build the full downsampled fast‐time × slow‐time matrix y
-  for idx_st in range(N_slow_time):
-      x_ft = sig_pair[idx_st, :]   # length N_ft
-      y[:, idx_st] = downsample(x_ft, Fs, Fc, B)
+  # Build the full downsampled fast‐time × slow‐time matrix y, all slow‐time frames in one batched FFT
+  y = downsample(sig_pair, Fs, Fc, B).T   # shape (M+1, N_slow_time)
 
   # Perform SVD
   #   y has shape (M+1, N_slow_time). We want U*(S)*Vh such that y = U @ np.diag(S) @ Vh